@@ -0,0 +1,310 @@
+"""
+asyncio interface to BlinkStick devices.
+
+USB transfers are run on an executor so they do not block the event loop, and
+animations wait with asyncio.sleep, so they can be cancelled at any step:
+
+    >>> import asyncio
+    >>> from blinkstick import aio
+    >>> async def main():
+    ...     stick = await aio.find_first()
+    ...     stick.play(stick.pulse(name="red", repeats=100))
+    ...     await asyncio.sleep(2)
+    ...     await stick.play(stick.morph(name="green"))
+    >>> asyncio.run(main())
+
+Requires Python 3.6 or later.
+"""
+
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from . import blinkstick
+
+_default_executor = None
+_default_executor_lock = threading.Lock()
+
+
+def _get_default_executor():
+    global _default_executor
+
+    with _default_executor_lock:
+        if _default_executor is None:
+            _default_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="blinkstick")
+
+        return _default_executor
+
+
+class _AsyncDevice(object):
+    def __init__(self, executor=None):
+        self._executor = executor or _get_default_executor()
+        # transfers to one device must not overlap, even on a multi-threaded executor
+        self._io_lock = threading.Lock()
+        self._animation = None
+
+    async def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._locked, func, *args, **kwargs))
+
+    def _locked(self, func, *args, **kwargs):
+        with self._io_lock:
+            return func(*args, **kwargs)
+
+    def play(self, animation):
+        """
+        Run the animation coroutine as the current animation of the device,
+        cancelling the animation which is currently running.
+
+        @type  animation: coroutine
+        @param animation: the animation to run, e.g. stick.pulse(name="red")
+        @rtype: asyncio.Task
+        @return: task running the animation
+        """
+        self.cancel()
+        self._animation = asyncio.ensure_future(animation)
+        return self._animation
+
+    def cancel(self):
+        """
+        Cancel the animation started with L{play}.
+        """
+        if self._animation is not None and not self._animation.done():
+            self._animation.cancel()
+        self._animation = None
+
+
+class AsyncBlinkStick(_AsyncDevice):
+    """
+    AsyncBlinkStick wraps L{blinkstick.BlinkStick} with coroutines for all
+    the operations which communicate with the device.
+    """
+
+    def __init__(self, stick, executor=None):
+        """
+        Initialize AsyncBlinkStick class.
+
+        @type  stick: BlinkStick
+        @param stick: the device to control
+        @type  executor: concurrent.futures.Executor
+        @param executor: executor to run USB transfers on, shared thread pool if not supplied
+        """
+        super(AsyncBlinkStick, self).__init__(executor)
+        self.stick = stick
+
+    def get_serial(self):
+        return self.stick.get_serial()
+
+    def get_variant(self):
+        return self.stick.get_variant()
+
+    def get_variant_string(self):
+        return self.stick.get_variant_string()
+
+    def set_error_reporting(self, error_reporting):
+        self.stick.set_error_reporting(error_reporting)
+
+    def set_inverse(self, value):
+        self.stick.set_inverse(value)
+
+    def get_inverse(self):
+        return self.stick.get_inverse()
+
+    def set_max_rgb_value(self, value):
+        self.stick.set_max_rgb_value(value)
+
+    def get_max_rgb_value(self):
+        return self.stick.max_rgb_value
+
+    async def get_manufacturer(self):
+        return await self._run(self.stick.get_manufacturer)
+
+    async def get_description(self):
+        return await self._run(self.stick.get_description)
+
+    async def set_color(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None):
+        await self._run(self.stick.set_color, channel=channel, index=index,
+                        red=red, green=green, blue=blue, name=name, hex=hex)
+
+    async def get_color(self, index=0, color_format='rgb'):
+        return await self._run(self.stick.get_color, index=index, color_format=color_format)
+
+    async def set_led_data(self, channel, data):
+        await self._run(self.stick.set_led_data, channel, data)
+
+    async def get_led_data(self, count):
+        return await self._run(self.stick.get_led_data, count)
+
+    async def set_mode(self, mode):
+        await self._run(self.stick.set_mode, mode)
+
+    async def get_mode(self):
+        return await self._run(self.stick.get_mode)
+
+    async def set_led_count(self, count):
+        await self._run(self.stick.set_led_count, count)
+
+    async def get_led_count(self):
+        return await self._run(self.stick.get_led_count)
+
+    async def get_info_block1(self):
+        return await self._run(self.stick.get_info_block1)
+
+    async def get_info_block2(self):
+        return await self._run(self.stick.get_info_block2)
+
+    async def set_info_block1(self, data):
+        await self._run(self.stick.set_info_block1, data)
+
+    async def set_info_block2(self, data):
+        await self._run(self.stick.set_info_block2, data)
+
+    async def set_random_color(self):
+        await self.set_color(name="random")
+
+    async def turn_off(self):
+        await self.set_color()
+
+    async def morph(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, duration=1000, steps=50,
+                    max_fps=None, easing='linear'):
+        """
+        Morph to the specified color. See L{blinkstick.BlinkStick.morph}.
+        """
+        end = self.stick._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
+        start = await self._run(self.stick._get_logical_color, index, channel)
+
+        keyframes = blinkstick._morph_keyframes(0.0, start, end, duration, steps if max_fps is None else 0, easing)
+        await self._play_keyframes(channel, index, keyframes, max_fps, easing)
+
+    async def _play_keyframes(self, channel, index, keyframes, max_fps, easing):
+        # steps are timed from the start, steps which are already over when sending falls behind are skipped
+        stick = self.stick
+        table_r, table_g, table_b = blinkstick._color_tables(stick.max_rgb_value, stick.gamma, stick.white_balance,
+                                                             stick.inverse)
+        loop = asyncio.get_event_loop()
+        started = loop.time()
+        position = 0
+        color = None
+
+        while True:
+            elapsed = loop.time() - started
+            position = blinkstick._advance_keyframes(keyframes, position, elapsed)
+
+            next_color = blinkstick._keyframe_color(keyframes, position, elapsed,
+                                                    easing if max_fps is not None else None)
+            if next_color != color:
+                color = next_color
+                await self._run(stick._send_color, channel, index, table_r[color[0]], table_g[color[1]],
+                                table_b[color[2]])
+
+            if position + 1 >= len(keyframes):
+                break
+
+            deadline = keyframes[position + 1][0]
+            if max_fps is not None:
+                deadline = min(deadline, elapsed + 1.0 / max_fps)
+            await asyncio.sleep(max(0.0, started + deadline - loop.time()))
+
+    async def pulse(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, repeats=1, duration=1000, steps=50,
+                    max_fps=None, easing='linear'):
+        """
+        Morph to the specified color from black and back again. See L{blinkstick.BlinkStick.pulse}.
+        """
+        red, green, blue = self.stick._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
+
+        effect = blinkstick.PulseEffect(red, green, blue, repeats=repeats, duration=duration, steps=steps,
+                                        max_fps=max_fps, easing=easing)
+        await self._play_keyframes(channel, index, effect.keyframes(None), max_fps, easing)
+
+    async def blink(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, repeats=1, delay=500):
+        """
+        Blink the specified color. See L{blinkstick.BlinkStick.blink}.
+        """
+        delay = float(delay) / float(1000)
+        for x in range(repeats):
+            if x:
+                await asyncio.sleep(delay)
+            await self.set_color(channel=channel, index=index, red=red, green=green, blue=blue, name=name, hex=hex)
+            await asyncio.sleep(delay)
+            await self.set_color(channel=channel, index=index)
+
+
+class AsyncBlinkStickPro(_AsyncDevice):
+    """
+    AsyncBlinkStickPro wraps L{blinkstick.BlinkStickPro} or L{blinkstick.BlinkStickProMatrix}.
+    The frame buffer is modified directly on the wrapped object, and sending it
+    to the device is done with coroutines.
+    """
+
+    def __init__(self, pro, executor=None):
+        """
+        Initialize AsyncBlinkStickPro class.
+
+        @type  pro: BlinkStickPro
+        @param pro: the frame buffer and device to control
+        @type  executor: concurrent.futures.Executor
+        @param executor: executor to run USB transfers on, shared thread pool if not supplied
+        """
+        super(AsyncBlinkStickPro, self).__init__(executor)
+        self.pro = pro
+
+    def set_color(self, *args, **kwargs):
+        self.pro.set_color(*args, **kwargs)
+
+    def get_color(self, *args, **kwargs):
+        return self.pro.get_color(*args, **kwargs)
+
+    def clear(self):
+        self.pro.clear()
+
+    async def connect(self, serial=None):
+        return await self._run(self.pro.connect, serial)
+
+    async def send_data(self, channel):
+        await self._run(self.pro.send_data, channel)
+
+    async def send_data_all(self, force=False):
+        await self._run(self.pro.send_data_all, force)
+
+    async def off(self):
+        await self._run(self.pro.off)
+
+
+async def find_all(executor=None):
+    """
+    Find all attached BlinkStick devices.
+
+    @rtype: AsyncBlinkStick[]
+    @return: a list of AsyncBlinkStick objects
+    """
+    loop = asyncio.get_event_loop()
+    sticks = await loop.run_in_executor(executor or _get_default_executor(), blinkstick.find_all)
+    return [AsyncBlinkStick(stick, executor) for stick in sticks]
+
+
+async def find_first(executor=None):
+    """
+    Find first attached BlinkStick.
+
+    @rtype: AsyncBlinkStick
+    @return: AsyncBlinkStick object or None if no devices are found
+    """
+    loop = asyncio.get_event_loop()
+    stick = await loop.run_in_executor(executor or _get_default_executor(), blinkstick.find_first)
+    if stick:
+        return AsyncBlinkStick(stick, executor)
+
+
+async def find_by_serial(serial=None, executor=None):
+    """
+    Find BlinkStick device based on serial number.
+
+    @rtype: AsyncBlinkStick
+    @return: AsyncBlinkStick object or None if no devices are found
+    """
+    loop = asyncio.get_event_loop()
+    stick = await loop.run_in_executor(executor or _get_default_executor(),
+                                       functools.partial(blinkstick.find_by_serial, serial=serial))
+    if stick:
+        return AsyncBlinkStick(stick, executor)
@@ -1,7 +1,13 @@
 from ._version import  __version__
+from . import virtual
+from . import fonts
+from . import primitives
+import math
 import time
 import sys
 import re
+import threading
+from collections import OrderedDict, deque
 try:
     from collections.abc import Callable
 except ImportError:
@@ -16,6 +22,16 @@ else:
 
 from random import randint
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+_monotonic = getattr(time, "monotonic", time.time)
+
+# time.sleep may oversleep by a scheduler tick, so the last part of a wait is spent busy-waiting
+_SPIN_TIME = 0.002
+
 """
 Main module to control BlinkStick and BlinkStick Pro devices.
 """
@@ -23,6 +39,12 @@ Main module to control BlinkStick and BlinkStick Pro devices.
 VENDOR_ID = 0x20a0
 PRODUCT_ID = 0x41e5
 
+_ZERO_PADDING = memoryview(bytes(bytearray(64 * 3)))
+
+# serial number -> (bus, address) of USB devices seen during discovery,
+# used by find_by_serial to check the last known location before scanning the bus
+_device_locations = {}
+
 class BlinkStickException(Exception):
     pass
 
@@ -196,9 +218,14 @@ class BlinkStick(object):
     BLINKSTICK_NANO = 5
     BLINKSTICK_FLEX = 6
 
+    # number of LEDs of each variant, BlinkStick Flex is queried from the device
+    _LED_COUNTS = {BLINKSTICK: 1, BLINKSTICK_STRIP: 8, BLINKSTICK_SQUARE: 8, BLINKSTICK_NANO: 2, BLINKSTICK_PRO: 64}
+
     inverse = False
     error_reporting = True
     max_rgb_value = 255
+    gamma = 1.0
+    white_balance = (1.0, 1.0, 1.0)
 
     def __init__(self, device=None, error_reporting=True):
         """
@@ -209,30 +236,47 @@ class BlinkStick(object):
         """
         self.error_reporting = error_reporting
 
+        # reusable report buffers for set_led_data keyed by report id
+        self._report_buffers = {}
+
+        # shadow copy of the data last written to each channel in GRB order, and
+        # which LEDs it is known for, so colors do not have to be read back
+        self._shadow = [bytearray(64 * 3), bytearray(64 * 3), bytearray(64 * 3)]
+        self._shadow_known = [bytearray(64), bytearray(64), bytearray(64)]
+
+        # LED count of a BlinkStick Flex, read from the device when first needed
+        self._led_count = None
+
+        # interval in seconds at which get_color checks the shadow copy against
+        # the device, None to never read colors which are known
+        self.verify_interval = None
+        self._last_verify = None
+        self.shadow_mismatches = 0
+
         if device:
             self.device = device
-            if sys.platform == "win32":
+            if _is_hid_device(device):
                 self.device.open()
                 self.reports = self.device.find_feature_reports()
             else:
                 self.open_device(device)
 
-            self.bs_serial = self.get_serial()
+            self._read_descriptors()
 
     def _usb_get_string(self, device, index):
         try:
-            return usb.util.get_string(device, index, 1033)
+            return _get_string(device, index)
         except usb.USBError:
             # Could not communicate with BlinkStick device
             # attempt to find it again based on serial
 
             if self._refresh_device():
-                return usb.util.get_string(self.device, index, 1033)
+                return _get_string(self.device, index)
             else:
                 raise BlinkStickException("Could not communicate with BlinkStick {0} - it may have been removed".format(self.bs_serial))
 
     def _usb_ctrl_transfer(self, bmRequestType, bRequest, wValue, wIndex, data_or_wLength):
-        if sys.platform == "win32":
+        if _is_hid_device(self.device):
             if bmRequestType == 0x20:
                 if sys.version_info[0] < 3:
                     data = (c_ubyte * len(data_or_wLength))(*[c_ubyte(ord(c)) for c in data_or_wLength])
@@ -265,8 +309,34 @@ class BlinkStick(object):
         d = find_by_serial(self.bs_serial)
         if d:
             self.device = d.device
+            self._set_descriptors(d.bs_serial, d._bcd_device)
+            # the device may have been reset while it was away
+            self._clear_shadow()
+            self._led_count = None
             return True
 
+    def _read_descriptors(self):
+        # Descriptors never change while the device is plugged in, so read them
+        # once here instead of doing a USB round trip on every get_* call
+        if _is_hid_device(self.device):
+            serial = self.device.serial_number
+            bcd_device = self.device.version_number
+        else:
+            serial = self._usb_get_string(self.device, 3)
+            bcd_device = self.device.bcdDevice
+            _device_locations[serial] = (self.device.bus, self.device.address)
+
+        self._set_descriptors(serial, bcd_device)
+
+    def _set_descriptors(self, serial, bcd_device):
+        self.bs_serial = serial
+        self._bcd_device = bcd_device
+        self._variant = self._determine_variant(serial, bcd_device)
+        # manufacturer and description are not needed to identify the device
+        # and are read on first use
+        self._manufacturer = None
+        self._description = None
+
     def get_serial(self):
         """
         Returns the serial number of device.::
@@ -282,10 +352,7 @@ class BlinkStick(object):
         @rtype: str
         @return: Serial number of the device
         """
-        if sys.platform == "win32":
-            return self.device.serial_number
-        else:
-            return self._usb_get_string(self.device, 3)
+        return self.bs_serial
 
     def get_manufacturer(self):
         """
@@ -294,10 +361,13 @@ class BlinkStick(object):
         @rtype: str
         @return: Device manufacturer's name
         """
-        if sys.platform == "win32":
-            return self.device.vendor_name
-        else:
-            return self._usb_get_string(self.device, 1)
+        if self._manufacturer is None:
+            if _is_hid_device(self.device):
+                self._manufacturer = self.device.vendor_name
+            else:
+                self._manufacturer = self._usb_get_string(self.device, 1)
+
+        return self._manufacturer
 
     def get_variant(self):
         """
@@ -306,15 +376,10 @@ class BlinkStick(object):
         @rtype: int
         @return: BlinkStick.UNKNOWN, BlinkStick.BLINKSTICK, BlinkStick.BLINKSTICK_PRO and etc
         """
+        return self._variant
 
-        serial = self.get_serial()
+    def _determine_variant(self, serial, version_attribute):
         major = serial[-3]
-        minor = serial[-1]
-
-        if sys.platform == "win32":
-            version_attribute = self.device.version_number
-        else:
-            version_attribute = self.device.bcdDevice
 
         if major == "1":
             return self.BLINKSTICK
@@ -365,10 +430,13 @@ class BlinkStick(object):
         @rtype: str
         @return: Device description
         """
-        if sys.platform == "win32":
-            return self.device.product_name
-        else:
-            return self._usb_get_string(self.device, 2)
+        if self._description is None:
+            if _is_hid_device(self.device):
+                self._description = self.device.product_name
+            else:
+                self._description = self._usb_get_string(self.device, 2)
+
+        return self._description
 
     def set_error_reporting(self, error_reporting):
         """
@@ -397,13 +465,11 @@ class BlinkStick(object):
 
         red, green, blue = self._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
 
-        r = int(round(red, 3))
-        g = int(round(green, 3))
-        b = int(round(blue, 3))
-
-        if self.inverse:
-            r, g, b = 255 - r, 255 - g, 255 - b
+        table_r, table_g, table_b = _color_tables(self.max_rgb_value, self.gamma, self.white_balance, self.inverse)
+        self._send_color(channel, index, table_r[red], table_g[green], table_b[blue])
 
+    def _send_color(self, channel, index, r, g, b):
+        # send a color already mapped through the color tables
         if index == 0 and channel == 0:
             control_string = bytes(bytearray([0, r, g, b]))
             report_id = 0x0001
@@ -417,7 +483,11 @@ class BlinkStick(object):
             try:
                 self._usb_ctrl_transfer(0x20, 0x9, report_id, 0, control_string)
             except Exception:
-                pass
+                return
+
+        if 0 <= channel < 3 and 0 <= index < 64:
+            self._shadow[channel][index * 3:index * 3 + 3] = bytearray([g, r, b])
+            self._shadow_known[channel][index] = 1
 
     def _determine_rgb(self, red=0, green=0, blue=0, name=None, hex=None):
 
@@ -435,23 +505,116 @@ class BlinkStick(object):
         except ValueError:
             red = green = blue = 0
 
-        red, green, blue = _remap_rgb_value([red, green, blue], self.max_rgb_value)
-
         # TODO - do smarts to determine input type from red var in case it is not int
 
-        return red, green, blue
+        return _to_byte(red), _to_byte(green), _to_byte(blue)
 
-    def _get_color_rgb(self, index=0):
-        if index == 0:
+    def _get_color_rgb(self, index=0, channel=0):
+        if 0 <= index < 64 and self._shadow_known[channel][index] and not (channel == 0 and self._verify_due()):
+            g, r, b = self._shadow[channel][index * 3:index * 3 + 3]
+        elif channel != 0:
+            # colors can only be read back from channel 0, LEDs which were never set are black
+            r = g = b = 255 if self.inverse else 0
+        elif index == 0:
             device_bytes = self._usb_ctrl_transfer(0x80 | 0x20, 0x1, 0x0001, 0, 33)
-            if self.inverse:
-                return [255 - device_bytes[1], 255 - device_bytes[2], 255 - device_bytes[3]]
-            else:
-                return [device_bytes[1], device_bytes[2], device_bytes[3]]
+            r, g, b = device_bytes[1], device_bytes[2], device_bytes[3]
+            self._update_shadow(0, bytearray([g, r, b]))
         else:
             data = self.get_led_data((index + 1) * 3)
+            g, r, b = data[index * 3], data[index * 3 + 1], data[index * 3 + 2]
+            self._update_shadow(0, bytearray(data[:(index + 1) * 3]))
+
+        if index == 0 and self.inverse:
+            return [255 - r, 255 - g, 255 - b]
+        else:
+            return [r, g, b]
 
-            return [data[index * 3 + 1], data[index * 3], data[index * 3 + 2]]
+    def _verify_due(self):
+        if self.verify_interval is None:
+            return False
+
+        now = _monotonic()
+        if self._last_verify is None or now - self._last_verify >= self.verify_interval:
+            self._last_verify = now
+            return True
+
+        return False
+
+    def _update_shadow(self, channel, data):
+        # store data read from the device, counting differences from what was written
+        shadow = self._shadow[channel]
+        known = self._shadow_known[channel]
+        length = min(len(data), len(shadow)) // 3 * 3
+
+        for index in range(0, length // 3):
+            if known[index] and shadow[index * 3:index * 3 + 3] != data[index * 3:index * 3 + 3]:
+                self.shadow_mismatches += 1
+
+        shadow[:length] = data[:length]
+        known[:length // 3] = b"\x01" * (length // 3)
+
+    def _clear_shadow(self):
+        for known in self._shadow_known:
+            known[:] = bytearray(len(known))
+
+    def _get_channel_data(self, channel, count):
+        # data of count LEDs in GRB order as sent to the device, read only if not known
+        shadow = self._shadow[channel]
+        known = self._shadow_known[channel]
+
+        if channel != 0:
+            # colors can only be read back from channel 0, LEDs which were never set are black
+            data = bytearray([255 if self.inverse else 0]) * (count * 3)
+            for index in range(0, min(count, 64)):
+                if known[index]:
+                    data[index * 3:index * 3 + 3] = shadow[index * 3:index * 3 + 3]
+            return data
+
+        if count <= 64 and all(known[:count]) and not self._verify_due():
+            return shadow[:count * 3]
+
+        data = bytearray(self.get_led_data(count * 3))[:count * 3]
+        self._update_shadow(0, data)
+
+        return data
+
+    def _get_default_led_count(self):
+        variant = self.get_variant()
+        if variant == self.BLINKSTICK_FLEX:
+            if self._led_count is None:
+                self._led_count = self.get_led_count()
+            return self._led_count
+
+        return self._LED_COUNTS.get(variant, 1)
+
+    def sync_from_device(self):
+        """
+        Replace the colors remembered from L{set_color} and L{set_led_data} with
+        the colors read from the device. Use it if another program changed the
+        colors since this object was created. Colors can only be read back for
+        channel 0, LEDs on other channels are taken as black until they are set.
+        """
+        self._clear_shadow()
+        self._led_count = None
+
+        if self.get_variant() == self.BLINKSTICK:
+            self._get_color_rgb(0)
+        else:
+            self._get_channel_data(0, min(64, self._get_default_led_count()))
+
+    def set_verify_interval(self, interval):
+        """
+        Colors returned by L{get_color} and used as the start of L{morph} are
+        remembered when they are set, without reading them back from the device.
+        Set an interval to read them back from time to time, which counts
+        differences in L{shadow_mismatches} and corrects the remembered colors.
+
+        @type  interval: float
+        @param interval: minimum time in seconds between reads, 0 to always read,
+            or None to never read known colors
+        """
+        self.verify_interval = interval
+        self._last_verify = None
 
     def _get_color_hex(self, index=0):
         r, g, b = self._get_color_rgb(index)
@@ -515,21 +678,32 @@ class BlinkStick(object):
 
         @type  channel: int
         @param channel: the channel which to send data to (R=0, G=1, B=2)
-        @type  data: int[0..64*3]
+        @type  data: int[0..64*3], bytes, bytearray, memoryview or array('B')
         @param data: The LED data frame in GRB format
         """
 
-        report_id, max_leds = self._determine_report_id(len(data))
+        length = len(data)
+        report_id, max_leds = self._determine_report_id(length)
+        size = max_leds * 3
 
-        report = [0, channel]
+        report = self._report_buffers.get(report_id)
+        if report is None:
+            report = self._report_buffers[report_id] = bytearray(2 + size)
 
-        for i in range(0, max_leds * 3):
-            if len(data) > i:
-                report.append(data[i])
-            else:
-                report.append(0)
+        if length > size:
+            data = data[:size]
+            length = size
+
+        report[1] = channel
+        report[2:2 + length] = data
+        # clear whatever a previous longer frame left in the padding
+        report[2 + length:] = _ZERO_PADDING[:size - length]
 
-        self._usb_ctrl_transfer(0x20, 0x9, report_id, 0, bytes(bytearray(report)))
+        self._usb_ctrl_transfer(0x20, 0x9, report_id, 0, report)
+
+        if 0 <= channel < 3:
+            self._shadow[channel][:size] = report[2:]
+            self._shadow_known[channel][:max_leds] = b"\x01" * max_leds
 
     def get_led_data(self, count):
         """
@@ -599,7 +773,7 @@ class BlinkStick(object):
         control_string = bytes(bytearray([0x81, count]))
 
         self._usb_ctrl_transfer(0x20, 0x9, 0x81, 0, control_string)
-
+        self._led_count = count
 
     def get_led_count(self):
         """
@@ -706,7 +880,8 @@ class BlinkStick(object):
         """
         self.set_color()
 
-    def pulse(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, repeats=1, duration=1000, steps=50):
+    def pulse(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, repeats=1, duration=1000, steps=50,
+              max_fps=None, easing='linear'):
         """
         Morph to the specified color from black and back again.
 
@@ -726,11 +901,18 @@ class BlinkStick(object):
         @param duration: Duration for pulse in milliseconds
         @type  steps: int
         @param steps: Number of gradient steps
+        @type  max_fps: float
+        @param max_fps: if supplied, colors are computed from the elapsed time and sent
+            at most max_fps times per second instead of in steps
+        @type  easing: str
+        @param easing: easing curve of the transitions, one of L{EASINGS}
         """
-        self.turn_off()
-        for x in range(repeats):
-            self.morph(channel=channel, index=index, red=red, green=green, blue=blue, name=name, hex=hex, duration=duration, steps=steps)
-            self.morph(channel=channel, index=index, red=0, green=0, blue=0, duration=duration, steps=steps)
+        red, green, blue = self._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
+
+        timeline = Timeline(self)
+        timeline.add(PulseEffect(red, green, blue, repeats=repeats, duration=duration, steps=steps,
+                                 channel=channel, index=index, max_fps=max_fps, easing=easing))
+        timeline.run()
 
     def blink(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, repeats=1, delay=500):
         """
@@ -751,15 +933,14 @@ class BlinkStick(object):
         @type  delay: int
         @param delay: time in milliseconds to light LED for, and also between blinks
         """
-        ms_delay = float(delay) / float(1000)
-        for x in range(repeats):
-            if x:
-                time.sleep(ms_delay)
-            self.set_color(channel=channel, index=index, red=red, green=green, blue=blue, name=name, hex=hex)
-            time.sleep(ms_delay)
-            self.set_color(channel=channel, index=index)
+        red, green, blue = self._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
+
+        timeline = Timeline(self)
+        timeline.add(BlinkEffect(red, green, blue, repeats=repeats, delay=delay, channel=channel, index=index))
+        timeline.run()
 
-    def morph(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, duration=1000, steps=50):
+    def morph(self, channel=0, index=0, red=0, green=0, blue=0, name=None, hex=None, duration=1000, steps=50,
+              max_fps=None, easing='linear'):
         """
         Morph to the specified color.
 
@@ -777,41 +958,81 @@ class BlinkStick(object):
         @param duration: Duration for morph in milliseconds
         @type  steps: int
         @param steps: Number of gradient steps (default 50)
+        @type  max_fps: float
+        @param max_fps: if supplied, colors are computed from the elapsed time and sent
+            at most max_fps times per second instead of in steps
+        @type  easing: str
+        @param easing: easing curve of the transitions, one of L{EASINGS}
         """
 
-        r_end, g_end, b_end = self._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
-        # descale the above values
-        r_end, g_end, b_end = _remap_rgb_value_reverse([r_end, g_end, b_end], self.max_rgb_value)
-
-        r_start, g_start, b_start = _remap_rgb_value_reverse(self._get_color_rgb(index), self.max_rgb_value)
-
-        if r_start > 255 or g_start > 255 or b_start > 255:
-            r_start = 0
-            g_start = 0
-            b_start = 0
-
-        gradient = []
-
-        steps += 1
-        for n in range(1, steps):
-            d = 1.0 * n / steps
-            r = (r_start * (1 - d)) + (r_end * d)
-            g = (g_start * (1 - d)) + (g_end * d)
-            b = (b_start * (1 - d)) + (b_end * d)
-
-            gradient.append((r, g, b))
+        red, green, blue = self._determine_rgb(red=red, green=green, blue=blue, name=name, hex=hex)
 
-        ms_delay = float(duration) / float(1000 * steps)
+        timeline = Timeline(self)
+        timeline.add(MorphEffect(red, green, blue, duration=duration, steps=steps, channel=channel, index=index,
+                                 max_fps=max_fps, easing=easing))
+        timeline.run()
 
-        self.set_color(channel=channel, index=index, red=r_start, green=g_start, blue=b_start)
+    def morph_frame(self, channel, colors, duration=1000, steps=50, index=0, max_fps=None, easing='linear'):
+        """
+        Morph each LED from its current color to its own color. All LEDs are
+        interpolated together, and each step is sent either as one
+        L{set_led_data} transfer or, when only a few LEDs change, with
+        L{set_color} for each of them.
 
-        for grad in gradient:
-            grad_r, grad_g, grad_b = grad
+        @type  channel: int
+        @param channel: the channel of the LEDs (R=0, G=1, B=2)
+        @type  colors: list, bytes, bytearray or numpy.ndarray
+        @param colors: (r, g, b) tuple for each LED starting at index, or packed RGB data
+        @type  duration: int
+        @param duration: Duration for morph in milliseconds
+        @type  steps: int
+        @param steps: Number of gradient steps (default 50)
+        @type  index: int
+        @param index: the index of the first LED
+        @type  max_fps: float
+        @param max_fps: if supplied, colors are computed from the elapsed time and sent
+            at most max_fps times per second instead of in steps
+        @type  easing: str
+        @param easing: easing curve of the transitions, one of L{EASINGS}
+        """
+        timeline = Timeline(self)
+        timeline.add(FrameMorphEffect(colors, duration=duration, steps=steps, channel=channel, index=index,
+                                      max_fps=max_fps, easing=easing))
+        timeline.run()
 
-            self.set_color(channel=channel, index=index, red=grad_r, green=grad_g, blue=grad_b)
-            time.sleep(ms_delay)
+    def pulse_frame(self, channel, colors, repeats=1, duration=1000, steps=50, index=0, max_fps=None,
+                    easing='linear'):
+        """
+        Morph each LED to its own color from black and back again. See L{morph_frame}.
 
-        self.set_color(channel=channel, index=index, red=r_end, green=g_end, blue=b_end)
+        @type  channel: int
+        @param channel: the channel of the LEDs (R=0, G=1, B=2)
+        @type  colors: list, bytes, bytearray or numpy.ndarray
+        @param colors: (r, g, b) tuple for each LED starting at index, or packed RGB data
+        @type  repeats: int
+        @param repeats: Number of times to pulse the LEDs
+        @type  duration: int
+        @param duration: Duration for pulse in milliseconds
+        @type  steps: int
+        @param steps: Number of gradient steps
+        @type  index: int
+        @param index: the index of the first LED
+        @type  max_fps: float
+        @param max_fps: if supplied, colors are computed from the elapsed time and sent
+            at most max_fps times per second instead of in steps
+        @type  easing: str
+        @param easing: easing curve of the transitions, one of L{EASINGS}
+        """
+        timeline = Timeline(self)
+        timeline.add(FramePulseEffect(colors, repeats=repeats, duration=duration, steps=steps,
+                                      channel=channel, index=index, max_fps=max_fps, easing=easing))
+        timeline.run()
+
+    def _get_logical_color(self, index=0, channel=0):
+        # descale the current device color back to the values set_color was called with
+        reverse_r, reverse_g, reverse_b = _reverse_color_tables(self.max_rgb_value, self.gamma, self.white_balance)
+        device_r, device_g, device_b = self._get_color_rgb(index, channel)
+        return reverse_r[device_r], reverse_g[device_g], reverse_b[device_b]
 
     def open_device(self, d):
         """Open device.
@@ -868,6 +1089,30 @@ class BlinkStick(object):
         """
         return self.max_rgb_value
 
+    def set_gamma(self, value):
+        """
+        Set gamma correction. {set_color} function will automatically apply
+        it to the supplied values.
+
+        @type  value: float
+        @param value: gamma exponent, 1.0 to disable correction, 2.2 - 2.8 is typical for WS2812 LEDs
+        """
+        self.gamma = value
+
+    def set_white_balance(self, red=1.0, green=1.0, blue=1.0):
+        """
+        Set white balance. {set_color} function will automatically scale each
+        color by the supplied factor.
+
+        @type  red: float
+        @param red: 0..1 scale factor for red
+        @type  green: float
+        @param green: 0..1 scale factor for green
+        @type  blue: float
+        @param blue: 0..1 scale factor for blue
+        """
+        self.white_balance = (red, green, blue)
+
     def _name_to_hex(self, name):
         """
         Convert a color name to a normalized hexadecimal color value.
@@ -972,256 +1217,1363 @@ class BlinkStick(object):
         """
         return self._hex_to_rgb(self._name_to_hex(name))
 
-class BlinkStickPro(object):
+
+class Effect(object):
+    """
+    Effect is the base class of animations run by L{Timeline}. An effect sets one
+    LED, a range of LEDs or a whole channel to the same color, and is described
+    by its keyframes: the colors it shows and the times they start at.
     """
-    BlinkStickPro class is specifically designed to control the individually
-    addressable LEDs connected to the device. The tutorials section contains
-    all the details on how to connect them to BlinkStick Pro.
 
-    U{http://www.blinkstick.com/help/tutorials}
+    # whether keyframes needs the color of the LED when the effect starts,
+    # which may have to be read from the device
+    uses_start_color = False
 
-    Code example on how you can use this class are available here:
+    # whether the colors of keyframes and the start color are packed RGB data
+    # with 3 bytes for each LED of the effect instead of one color for all LEDs
+    per_led_colors = False
 
-    U{https://github.com/arvydas/blinkstick-python/wiki#code-examples-for-blinkstick-pro}
-    """
+    # if set, colors between keyframes are interpolated from the elapsed time
+    # and sent at most max_fps times per second
+    max_fps = None
 
-    def __init__(self, r_led_count=0, g_led_count=0, b_led_count=0, delay=0.002, max_rgb_value=255):
+    # easing curve of the transitions between keyframes, see L{EASINGS}
+    easing = 'linear'
+
+    def __init__(self, channel=0, index=0, count=1):
         """
-        Initialize BlinkStickPro class.
+        Initialize Effect class.
 
-        @type r_led_count: int
-        @param r_led_count: number of LEDs on R channel
-        @type g_led_count: int
-        @param g_led_count: number of LEDs on G channel
-        @type b_led_count: int
-        @param b_led_count: number of LEDs on B channel
-        @type delay: int
-        @param delay: default transmission delay between frames
-        @type max_rgb_value: int
-        @param max_rgb_value: maximum color value for RGB channels
+        @type  channel: int
+        @param channel: the channel of the LEDs (R=0, G=1, B=2)
+        @type  index: int
+        @param index: the index of the first LED
+        @type  count: int
+        @param count: number of LEDs, or None for all LEDs from index to the end of the channel
         """
+        self.channel = channel
+        self.index = index
+        self.count = count
 
-        self.r_led_count = r_led_count
-        self.g_led_count = g_led_count
-        self.b_led_count = b_led_count
+        self._delay = 0.0
+        self._start = None
+        self._keyframes = None
+        self._position = 0
 
-        self.fps_count = -1
+    def keyframes(self, start_color):
+        """
+        Get the keyframes of the effect.
 
-        self.data_transmission_delay = delay
+        @type  start_color: (int, int, int) or bytearray
+        @param start_color: color of the first LED when the effect starts, or the colors
+            of all its LEDs if L{per_led_colors} is set, None unless L{uses_start_color} is set
+        @rtype: list
+        @return: (time, (r, g, b)) tuples sorted by time, the time being seconds from the start
+            of the effect, with packed RGB data instead of (r, g, b) if L{per_led_colors} is set
+        """
+        raise NotImplementedError()
 
-        self.max_rgb_value = max_rgb_value
 
-        # initialise data store for each channel
-        # pre-populated with zeroes
+def _advance_keyframes(keyframes, position, elapsed):
+    # position of the keyframe shown at elapsed, skipping keyframes which are already over
+    while position + 1 < len(keyframes) and keyframes[position + 1][0] <= elapsed:
+        position += 1
 
-        self.data = [[], [], []]
+    return position
 
-        for i in range(0, r_led_count):
-            self.data[0].append([0, 0, 0])
 
-        for i in range(0, g_led_count):
-            self.data[1].append([0, 0, 0])
+def _keyframe_color(keyframes, position, elapsed, easing=None):
+    # color of the keyframe at position, or interpolated towards the next keyframe
+    # along the easing curve if one is supplied
+    time, color = keyframes[position]
+    if easing is None or position + 1 >= len(keyframes):
+        return color
 
-        for i in range(0, b_led_count):
-            self.data[2].append([0, 0, 0])
+    end_time, end_color = keyframes[position + 1]
+    if end_time <= time:
+        return color
 
-        self.bstick = None
+    d = _ease(easing, min(1.0, max(0.0, (elapsed - time) / (end_time - time))))
+    if isinstance(color, tuple):
+        return tuple(_to_byte(s * (1 - d) + e * d) for s, e in zip(color, end_color))
 
-    def set_color(self, channel, index, r, g, b, remap_values=True):
-        """
-        Set the color of a single pixel
+    return _interpolate_frames(color, end_color, [d])[0]
 
-        @type channel: int
-        @param channel: R, G or B channel
-        @type index: int
-        @param index: the index of LED on the channel
-        @type r: int
-        @param r: red color byte
-        @type g: int
-        @param g: green color byte
-        @type b: int
-        @param b: blue color byte
-        """
 
-        if remap_values:
-            r, g, b = [_remap_color(val, self.max_rgb_value) for val in [r, g, b]]
+def _morph_keyframes(offset, start, end, duration, steps, easing='linear'):
+    table = _gradient_table(start, end, steps, easing)
+    delay = float(duration) / float(1000 * (steps + 1))
 
-        self.data[channel][index] = [g, r, b]
+    return [(offset + n * delay, tuple(table[n * 3:n * 3 + 3])) for n in range(0, steps + 2)]
 
-    def get_color(self, channel, index):
-        """
-        Get the current color of a single pixel.
 
-        @type  channel: int
-        @param channel: the channel of the LED
-        @type  index: int
-        @param index: the index of the LED
+class MorphEffect(Effect):
+    """
+    Morph from the current color to the specified color. See L{BlinkStick.morph}.
+    """
 
-        @rtype: (int, int, int)
-        @return: 3-tuple for R, G and B values
-        """
+    uses_start_color = True
 
-        val = self.data[channel][index]
-        return [val[1], val[0], val[2]]
+    def __init__(self, red=0, green=0, blue=0, duration=1000, steps=50, channel=0, index=0, count=1, max_fps=None,
+                 easing='linear'):
+        super(MorphEffect, self).__init__(channel, index, count)
+        self.color = (red, green, blue)
+        self.duration = duration
+        self.steps = steps
+        self.max_fps = max_fps
+        self.easing = easing
 
-    def clear(self):
-        """
-        Set all pixels to black in the frame buffer.
-        """
-        for x in range(0, self.r_led_count):
-            self.set_color(0, x, 0, 0, 0)
+    def keyframes(self, start_color):
+        steps = self.steps if self.max_fps is None else 0
+        return _morph_keyframes(0.0, start_color, self.color, self.duration, steps, self.easing)
 
-        for x in range(0, self.g_led_count):
-            self.set_color(1, x, 0, 0, 0)
 
-        for x in range(0, self.b_led_count):
-            self.set_color(2, x, 0, 0, 0)
+class PulseEffect(Effect):
+    """
+    Morph to the specified color from black and back again. See L{BlinkStick.pulse}.
+    """
 
-    def off(self):
-        """
-        Set all pixels to black in on the device.
-        """
-        self.clear()
-        self.send_data_all()
+    def __init__(self, red=0, green=0, blue=0, repeats=1, duration=1000, steps=50, channel=0, index=0, count=1,
+                 max_fps=None, easing='linear'):
+        super(PulseEffect, self).__init__(channel, index, count)
+        self.color = (red, green, blue)
+        self.repeats = repeats
+        self.duration = duration
+        self.steps = steps
+        self.max_fps = max_fps
+        self.easing = easing
 
-    def connect(self, serial=None):
-        """
-        Connect to the first BlinkStick found
+    def keyframes(self, start_color):
+        black = (0, 0, 0)
+        period = float(self.duration) / 1000
+        steps = self.steps if self.max_fps is None else 0
 
-        @type serial: str
-        @param serial: Select the serial number of BlinkStick
-        """
+        # the keyframes are the same for every repeat
+        cycle = _morph_keyframes(0.0, black, self.color, self.duration, steps, self.easing) + \
+            _morph_keyframes(period, self.color, black, self.duration, steps, self.easing)
+        keyframes = [(0.0, black)]
 
-        if serial is None:
-            self.bstick = find_first()
-        else:
-            self.bstick = find_by_serial(serial=serial)
+        for x in range(self.repeats):
+            keyframes += [(2 * x * period + time, color) for time, color in cycle]
 
-        return self.bstick is not None
+        return keyframes
 
-    def send_data(self, channel):
-        """
-        Send data stored in the internal buffer to the channel.
 
-        @param channel:
-            - 0 - R pin on BlinkStick Pro board
-            - 1 - G pin on BlinkStick Pro board
-            - 2 - B pin on BlinkStick Pro board
-        """
-        packet_data = [item for sublist in self.data[channel] for item in sublist]
+class BlinkEffect(Effect):
+    """
+    Blink the specified color. See L{BlinkStick.blink}.
+    """
 
-        try:
-            self.bstick.set_led_data(channel, packet_data)
-            time.sleep(self.data_transmission_delay)
-        except Exception as e:
-            print("Exception: {0}".format(e))
+    def __init__(self, red=0, green=0, blue=0, repeats=1, delay=500, channel=0, index=0, count=1):
+        super(BlinkEffect, self).__init__(channel, index, count)
+        self.color = (red, green, blue)
+        self.repeats = repeats
+        self.delay = delay
 
-    def send_data_all(self):
-        """
-        Send data to all channels
-        """
-        if self.r_led_count > 0:
-            self.send_data(0)
+    def keyframes(self, start_color):
+        delay = float(self.delay) / 1000
+        keyframes = []
 
-        if self.g_led_count > 0:
-            self.send_data(1)
+        for x in range(self.repeats):
+            keyframes.append((2 * x * delay, self.color))
+            keyframes.append(((2 * x + 1) * delay, (0, 0, 0)))
 
-        if self.b_led_count > 0:
-            self.send_data(2)
+        return keyframes
 
-class BlinkStickProMatrix(BlinkStickPro):
-    """
-    BlinkStickProMatrix class is specifically designed to control the individually
-    addressable LEDs connected to the device and arranged in a matrix. The tutorials section contains
-    all the details on how to connect them to BlinkStick Pro with matrices.
 
-    U{http://www.blinkstick.com/help/tutorials/blinkstick-pro-adafruit-neopixel-matrices}
+def _packed_colors(colors):
+    # packed RGB data from packed data, an array of (r, g, b) rows or a list of (r, g, b) tuples
+    if isinstance(colors, (bytes, bytearray, memoryview)):
+        return bytearray(colors)
 
-    Code example on how you can use this class are available here:
+    if numpy is not None and isinstance(colors, numpy.ndarray):
+        return bytearray(colors.astype(numpy.uint8).tobytes())
 
-    U{https://github.com/arvydas/blinkstick-python/wiki#code-examples-for-blinkstick-pro}
+    return bytearray([int(value) for color in colors for value in color])
 
-    Matrix is driven by using L{BlinkStickProMatrix.set_color} with [x,y] coordinates and class automatically
-    divides data into subsets and sends it to the matrices.
 
-    For example, if you have 2 8x8 matrices connected to BlinkStickPro and you initialize
-    the class with
+def _interpolate_frames(start, end, positions):
+    # packed colors at each position from start (0.0) to end (1.0), computed
+    # for all LEDs at once with NumPy if it is installed
+    if numpy is not None:
+        first = numpy.frombuffer(bytes(start), dtype=numpy.uint8)
+        last = numpy.frombuffer(bytes(end), dtype=numpy.uint8)
+        positions = numpy.array(positions)
+        values = numpy.round(numpy.outer(1 - positions, first) + numpy.outer(positions, last), 3)
+        return [bytearray(row) for row in numpy.clip(values, 0, 255).astype(numpy.uint8)]
 
-        >>> matrix = BlinkStickProMatrix(r_columns=8, r_rows=8, g_columns=8, g_rows=8)
+    return [bytearray([_to_byte(s * (1 - d) + e * d) for s, e in zip(start, end)]) for d in positions]
 
-    Then you can set the internal framebuffer by using {set_color} command:
 
-        >>> matrix.set_color(x=10, y=5, r=255, g=0, b=0)
-        >>> matrix.set_color(x=6, y=3, r=0, g=255, b=0)
+def _morph_frame_keyframes(offset, start, end, duration, steps, easing='linear'):
+    delay = float(duration) / float(1000 * (steps + 1))
+    positions = [_ease(easing, 1.0 * n / (steps + 1)) for n in range(0, steps + 2)]
 
-    And send data to both matrices in one go:
+    return [(offset + n * delay, frame) for n, frame in enumerate(_interpolate_frames(start, end, positions))]
 
-        >>> matrix.send_data_all()
 
+class FrameMorphEffect(Effect):
+    """
+    Morph each LED from its current color to its own color. See L{BlinkStick.morph_frame}.
     """
 
-    def __init__(self, r_columns=0, r_rows=0, g_columns=0, g_rows=0, b_columns=0, b_rows=0, delay=0.002, max_rgb_value=255):
-        """
-        Initialize BlinkStickProMatrix class.
+    uses_start_color = True
+    per_led_colors = True
 
-        @type r_columns: int
-        @param r_columns: number of matric columns for R channel
-        @type g_columns: int
-        @param g_columns: number of matric columns for R channel
-        @type b_columns: int
-        @param b_columns: number of matric columns for R channel
-        @type delay: int
-        @param delay: default transmission delay between frames
-        @type max_rgb_value: int
-        @param max_rgb_value: maximum color value for RGB channels
+    def __init__(self, colors, duration=1000, steps=50, channel=0, index=0, max_fps=None, easing='linear'):
         """
-        r_leds = r_columns * r_rows
-        g_leds = g_columns * g_rows
-        b_leds = b_columns * b_rows
+        Initialize FrameMorphEffect class.
 
-        self.r_columns = r_columns
-        self.r_rows = r_rows
-        self.g_columns = g_columns
-        self.g_rows = g_rows
-        self.b_columns = b_columns
-        self.b_rows = b_rows
+        @type  colors: list, bytes, bytearray or numpy.ndarray
+        @param colors: (r, g, b) tuple for each LED starting at index, or packed RGB data
+        """
+        self.colors = _packed_colors(colors)
+        super(FrameMorphEffect, self).__init__(channel, index, len(self.colors) // 3)
+        self.duration = duration
+        self.steps = steps
+        self.max_fps = max_fps
+        self.easing = easing
 
-        super(BlinkStickProMatrix, self).__init__(r_led_count=r_leds, g_led_count=g_leds, b_led_count=b_leds, delay=delay, max_rgb_value=max_rgb_value)
+    def keyframes(self, start_color):
+        steps = self.steps if self.max_fps is None else 0
+        return _morph_frame_keyframes(0.0, start_color, self.colors, self.duration, steps, self.easing)
 
-        self.rows = max(r_rows, g_rows, b_rows)
-        self.cols = r_columns + g_columns + b_columns
 
-        # initialise data store for matrix pre-populated with zeroes
-        self.matrix_data = []
+class FramePulseEffect(Effect):
+    """
+    Morph each LED to its own color from black and back again. See L{BlinkStick.pulse_frame}.
+    """
 
-        for i in range(0, self.rows * self.cols):
-            self.matrix_data.append([0, 0, 0])
+    per_led_colors = True
 
-    def set_color(self, x, y, r, g, b, remap_values=True):
+    def __init__(self, colors, repeats=1, duration=1000, steps=50, channel=0, index=0, max_fps=None,
+                 easing='linear'):
         """
-        Set the color of a single pixel in the internal framebuffer.
+        Initialize FramePulseEffect class.
 
-        @type x: int
-        @param x: the x location in the matrix
-        @type y: int
-        @param y: the y location in the matrix
-        @type r: int
-        @param r: red color byte
-        @type g: int
-        @param g: green color byte
-        @type b: int
-        @param b: blue color byte
-        @type remap_values: bool
-        @param remap_values: Automatically remap values based on the {max_rgb_value} supplied in the constructor
+        @type  colors: list, bytes, bytearray or numpy.ndarray
+        @param colors: (r, g, b) tuple for each LED starting at index, or packed RGB data
         """
+        self.colors = _packed_colors(colors)
+        super(FramePulseEffect, self).__init__(channel, index, len(self.colors) // 3)
+        self.repeats = repeats
+        self.duration = duration
+        self.steps = steps
+        self.max_fps = max_fps
+        self.easing = easing
 
-        if remap_values:
-            r, g, b = [_remap_color(val, self.max_rgb_value) for val in [r, g, b]]
+    def keyframes(self, start_color):
+        black = bytearray(len(self.colors))
+        period = float(self.duration) / 1000
+        steps = self.steps if self.max_fps is None else 0
 
-        self.matrix_data[self._coord_to_index(x, y)] = [g, r, b]
+        # the frames are the same for every repeat
+        rising = _morph_frame_keyframes(0.0, black, self.colors, self.duration, steps, self.easing)
+        falling = _morph_frame_keyframes(period, self.colors, black, self.duration, steps, self.easing)
+        keyframes = [(0.0, black)]
 
-    def _coord_to_index(self, x, y):
-        return y * self.cols + x
+        for x in range(self.repeats):
+            keyframes += [(2 * x * period + time, frame) for time, frame in rising + falling]
+
+        return keyframes
+
+
+# cost of a HID report sent with a control transfer, in 8 byte packets: the
+# setup and status stages, one data packet per started 8 bytes, and the
+# scheduling of the transfer which usually outweighs its data
+_TRANSFER_OVERHEAD = 4
+
+
+def _report_cost(size):
+    return _TRANSFER_OVERHEAD + 2 + (size + 7) // 8
+
+
+class Timeline(object):
+    """
+    Timeline runs many effects on the LEDs of one BlinkStick at the same time.
+    All effects advance on a shared clock, and each tick sends the LEDs which
+    changed: a few LEDs are set with L{BlinkStick.set_color}, more with a single
+    L{BlinkStick.set_led_data} transfer for the whole channel, whichever sends
+    less over USB.
+
+    For example, to pulse all 8 LEDs of BlinkStick Square with a different
+    delay for each LED:
+
+        >>> timeline = Timeline(blinkstick.find_first())
+        >>> for i in range(0, 8):
+        ...     timeline.add(PulseEffect(red=255, index=i), delay=i * 0.1)
+        >>> timeline.run()
+
+    When effects overlap, the effect added last sets the color.
+
+    Effects are timed from absolute deadlines on the monotonic clock, and the
+    time spent sending is not added to them: when a tick is late, the keyframes
+    which are already over are skipped, so effects finish on time.
+    """
+
+    def __init__(self, stick, led_count=None):
+        """
+        Initialize Timeline class.
+
+        @type  stick: BlinkStick
+        @param stick: the device to animate
+        @type  led_count: int
+        @param led_count: number of LEDs on each channel, based on the variant of the device if not supplied
+        """
+        self.stick = stick
+        self.led_count = led_count
+        self.effects = []
+
+        # colors of LEDs on the device as they were passed to set_color, by (channel, index)
+        self._colors = {}
+        # colors of whole channels in GRB order, read from the device when first needed
+        self._frames = {}
+
+    def add(self, effect, delay=0):
+        """
+        Add an effect. Its keyframes are computed when it starts.
+
+        @type  effect: Effect
+        @param effect: the effect to add
+        @type  delay: float
+        @param delay: time in seconds from the next tick to the start of the effect
+        @rtype: Effect
+        @return: the effect
+        """
+        effect._delay = delay
+        effect._start = None
+        effect._keyframes = None
+        effect._position = 0
+        self.effects.append(effect)
+        return effect
+
+    def _get_led_count(self):
+        if self.led_count is None:
+            self.led_count = self.stick._get_default_led_count()
+
+        return self.led_count
+
+    def get_color(self, channel=0, index=0):
+        """
+        Get the color of a LED, reading it from the device the first time.
+
+        @rtype: (int, int, int)
+        @return: 3-tuple for R, G and B values
+        """
+        color = self._colors.get((channel, index))
+
+        if color is None:
+            frame = self._frames.get(channel)
+            if frame is not None and index * 3 < len(frame):
+                color = (frame[index * 3 + 1], frame[index * 3], frame[index * 3 + 2])
+            else:
+                color = tuple(self.stick._get_logical_color(index, channel))
+
+            self._colors[(channel, index)] = color
+
+        return color
+
+    def _get_colors(self, channel, leds):
+        # packed RGB colors of a range of LEDs, LEDs past the end of the channel are black
+        frame = self._frames.get(channel)
+        if frame is None:
+            frame = self._read_frame(channel)
+
+        colors = bytearray(len(leds) * 3)
+        if len(leds):
+            part = _swap_red_green(frame[leds[0] * 3:(leds[-1] + 1) * 3])
+            colors[:len(part)] = part
+
+        return colors
+
+    def _use_led_reports(self, changed):
+        # set LEDs one by one when that sends less than a report for the whole channel,
+        # the LED count is only needed when it is not cheaper than the smallest report
+        if changed * _report_cost(6) <= _report_cost(2 + 8 * 3):
+            return True
+
+        report_id, max_leds = self.stick._determine_report_id(self._get_led_count() * 3)
+        return changed * _report_cost(6) <= _report_cost(2 + max_leds * 3)
+
+    def _leds(self, effect):
+        if effect.count is None:
+            return range(effect.index, self._get_led_count())
+        return range(effect.index, effect.index + effect.count)
+
+    def tick(self, now=None):
+        """
+        Advance all effects to the time now and send the LEDs which changed.
+
+        @type  now: float
+        @param now: monotonic time in seconds, the current time if not supplied
+        @rtype: float
+        @return: time of the next change, or None if all effects have finished
+        """
+        if now is None:
+            now = _monotonic()
+
+        changes = {}
+        next_change = None
+        running = []
+
+        for effect in self.effects:
+            if effect._start is None:
+                effect._start = now + effect._delay
+
+            if now < effect._start:
+                running.append(effect)
+                next_change = effect._start if next_change is None else min(next_change, effect._start)
+                continue
+
+            if effect._keyframes is None:
+                start_color = None
+                if effect.uses_start_color and effect.per_led_colors:
+                    start_color = self._get_colors(effect.channel, self._leds(effect))
+                elif effect.uses_start_color:
+                    start_color = self.get_color(effect.channel, effect.index)
+                effect._keyframes = effect.keyframes(start_color)
+                if not effect._keyframes:
+                    continue
+
+            # skip keyframes which are already over when the tick is late
+            keyframes = effect._keyframes
+            elapsed = now - effect._start
+            position = effect._position = _advance_keyframes(keyframes, effect._position, elapsed)
+
+            color = _keyframe_color(keyframes, position, elapsed, effect.easing if effect.max_fps is not None else None)
+            if effect.per_led_colors:
+                for i, index in enumerate(self._leds(effect)):
+                    changes[(effect.channel, index)] = tuple(color[i * 3:i * 3 + 3])
+            else:
+                for index in self._leds(effect):
+                    changes[(effect.channel, index)] = color
+
+            if position + 1 < len(keyframes):
+                running.append(effect)
+                start = effect._start + keyframes[position + 1][0]
+                if effect.max_fps is not None:
+                    # the next frame is due a period after this one, frames missed
+                    # by a late tick are dropped rather than sent late
+                    start = min(start, now + 1.0 / effect.max_fps)
+                next_change = start if next_change is None else min(next_change, start)
+
+        self.effects = running
+        self._flush(changes)
+
+        return next_change
+
+    def _flush(self, changes):
+        by_channel = {}
+        for (channel, index), color in changes.items():
+            if self._colors.get((channel, index)) != color:
+                by_channel.setdefault(channel, {})[index] = color
+
+        for channel, colors in by_channel.items():
+            frame = self._frames.get(channel)
+
+            if self._use_led_reports(len(colors)):
+                stick = self.stick
+                table_r, table_g, table_b = _color_tables(stick.max_rgb_value, stick.gamma, stick.white_balance,
+                                                          stick.inverse)
+                for index, (r, g, b) in sorted(colors.items()):
+                    stick._send_color(channel, index, table_r[r], table_g[g], table_b[b])
+                    if frame is not None and index * 3 < len(frame):
+                        frame[index * 3:index * 3 + 3] = bytearray([g, r, b])
+            else:
+                if frame is None:
+                    frame = self._read_frame(channel)
+
+                for index, (r, g, b) in colors.items():
+                    frame[index * 3:index * 3 + 3] = bytearray([g, r, b])
+
+                self._send_frame(channel, frame)
+
+            for index, color in colors.items():
+                self._colors[(channel, index)] = color
+
+    def _read_frame(self, channel):
+        # the LEDs which are not animated are sent too, so start from what the device shows
+        count = self._get_led_count()
+        frame = self._frames[channel] = bytearray(count * 3)
+
+        try:
+            data = self.stick._get_channel_data(channel, count)
+        except Exception:
+            if self.stick.error_reporting:
+                raise
+            data = bytearray()
+
+        if self.stick.inverse:
+            data = bytearray(255 - value for value in data)
+
+        reverse_r, reverse_g, reverse_b = _reverse_color_tables(
+            self.stick.max_rgb_value, self.stick.gamma, self.stick.white_balance)
+        frame[0:len(data):3] = data[0::3].translate(reverse_g)
+        frame[1:len(data):3] = data[1::3].translate(reverse_r)
+        frame[2:len(data):3] = data[2::3].translate(reverse_b)
+
+        # colors set by the timeline are known exactly
+        for (color_channel, index), (r, g, b) in self._colors.items():
+            if color_channel == channel and index < count:
+                frame[index * 3:index * 3 + 3] = bytearray([g, r, b])
+
+        return frame
+
+    def _send_frame(self, channel, frame):
+        stick = self.stick
+        table_r, table_g, table_b = _color_tables(stick.max_rgb_value, stick.gamma, stick.white_balance, stick.inverse)
+
+        wire = bytearray(len(frame))
+        wire[0::3] = frame[0::3].translate(table_g)
+        wire[1::3] = frame[1::3].translate(table_r)
+        wire[2::3] = frame[2::3].translate(table_b)
+
+        try:
+            stick.set_led_data(channel, wire)
+        except Exception:
+            if stick.error_reporting:
+                raise
+
+    def run(self):
+        """
+        Run all effects until they finish.
+        """
+        next_change = self.tick()
+
+        while next_change is not None:
+            _sleep_until(next_change)
+            next_change = self.tick()
+
+
+class FrameStats(object):
+    """
+    Frame rate statistics of L{BlinkStickPro.send_data_all} calls measured over
+    a window of the most recent frames.
+    """
+
+    def __init__(self, window=60):
+        """
+        Initialize FrameStats class.
+
+        @type window: int
+        @param window: number of most recent frame intervals to calculate fps and jitter from
+        """
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all counters.
+        """
+        self.frames = 0
+        self.late_frames = 0
+        self.dropped_frames = 0
+        self.fps = 0.0
+        self.jitter = 0.0
+        self._intervals = deque(maxlen=self.window)
+        self._last_frame = None
+
+    def _record(self, timestamp, late=False, dropped=0):
+        self.frames += 1
+        if late:
+            self.late_frames += 1
+        self.dropped_frames += dropped
+
+        if self._last_frame is not None:
+            self._intervals.append(timestamp - self._last_frame)
+
+            mean = sum(self._intervals) / len(self._intervals)
+            self.fps = 1.0 / mean if mean > 0 else 0.0
+            # mean absolute deviation of the frame interval in seconds
+            self.jitter = sum(abs(i - mean) for i in self._intervals) / len(self._intervals)
+
+        self._last_frame = timestamp
+
+    def __repr__(self):
+        return "FrameStats(frames={0}, fps={1:.2f}, jitter={2:.6f}, late_frames={3}, dropped_frames={4})".format(
+            self.frames, self.fps, self.jitter, self.late_frames, self.dropped_frames)
+
+
+class BlinkStickPro(object):
+    """
+    BlinkStickPro class is specifically designed to control the individually
+    addressable LEDs connected to the device. The tutorials section contains
+    all the details on how to connect them to BlinkStick Pro.
+
+    U{http://www.blinkstick.com/help/tutorials}
+
+    Code example on how you can use this class are available here:
+
+    U{https://github.com/arvydas/blinkstick-python/wiki#code-examples-for-blinkstick-pro}
+    """
+
+    def __init__(self, r_led_count=0, g_led_count=0, b_led_count=0, delay=0.002, max_rgb_value=255):
+        """
+        Initialize BlinkStickPro class.
+
+        @type r_led_count: int
+        @param r_led_count: number of LEDs on R channel
+        @type g_led_count: int
+        @param g_led_count: number of LEDs on G channel
+        @type b_led_count: int
+        @param b_led_count: number of LEDs on B channel
+        @type delay: int
+        @param delay: default transmission delay between frames
+        @type max_rgb_value: int
+        @param max_rgb_value: maximum color value for RGB channels
+        """
+
+        self.r_led_count = r_led_count
+        self.g_led_count = g_led_count
+        self.b_led_count = b_led_count
+
+        self.fps_count = -1
+        self.frame_stats = FrameStats()
+
+        # frames per second send_data_all is paced to, None to send immediately
+        self.target_fps = None
+        self._next_deadline = None
+
+        self.data_transmission_delay = delay
+
+        self.max_rgb_value = max_rgb_value
+        self.gamma = 1.0
+        self.white_balance = (1.0, 1.0, 1.0)
+
+        # color tables applied when data was last sent, a change resends all channels
+        self._sent_color_tables = None
+        # buffers holding the remapped data sent to each channel
+        self._wire = [bytearray(), bytearray(), bytearray()]
+
+        # initialise data store for each channel pre-populated with zeroes,
+        # each pixel takes 3 bytes in the GRB order the device expects
+        self.data = [bytearray(r_led_count * 3), bytearray(g_led_count * 3), bytearray(b_led_count * 3)]
+
+        # channels changed since they were last sent to the device
+        self._dirty = [True, True, True]
+
+        # interval in seconds at which send_data_all sends unchanged channels too,
+        # None to only send changed channels
+        self.full_refresh_interval = None
+        self._last_full_refresh = None
+
+        # background sender state, see start_sender
+        self._sender = None
+        self._sender_running = False
+        self._frame_ready = threading.Condition()
+        self._front = [None, None, None]
+        self._back = [None, None, None]
+        self._pending = [False, False, False]
+
+        # recording.Recorder which frames sent to the device are written to
+        self.recorder = None
+
+        self.bstick = None
+
+    def set_color(self, channel, index, r, g, b, remap_values=True):
+        """
+        Set the color of a single pixel
+
+        @type channel: int
+        @param channel: R, G or B channel
+        @type index: int
+        @param index: the index of LED on the channel
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type remap_values: bool
+        @param remap_values: Colors are remapped based on the {max_rgb_value}, gamma and
+            white balance when the data is sent. Set to False for values which are already
+            remapped and are sent as they are.
+        """
+
+        r, g, b = self._unmapped_color(r, g, b, remap_values)
+
+        data = self.data[channel]
+        i = index * 3
+        if data[i] != g or data[i + 1] != r or data[i + 2] != b:
+            data[i] = g
+            data[i + 1] = r
+            data[i + 2] = b
+            self._dirty[channel] = True
+
+    def _unmapped_color(self, r, g, b, remap_values):
+        r, g, b = _to_byte(r), _to_byte(g), _to_byte(b)
+
+        if remap_values:
+            return r, g, b
+
+        # store the color which the color tables map to the values passed in
+        reverse_r, reverse_g, reverse_b = _reverse_color_tables(self.max_rgb_value, self.gamma, self.white_balance)
+        return reverse_r[r], reverse_g[g], reverse_b[b]
+
+    def get_color(self, channel, index):
+        """
+        Get the current color of a single pixel.
+
+        @type  channel: int
+        @param channel: the channel of the LED
+        @type  index: int
+        @param index: the index of the LED
+
+        @rtype: (int, int, int)
+        @return: 3-tuple for R, G and B values
+        """
+
+        data = self.data[channel]
+        i = index * 3
+        return [data[i + 1], data[i], data[i + 2]]
+
+    def _write(self, channel, start, pixels):
+        # copy GRB pixel data into the channel buffer at LED index start
+        data = self.data[channel]
+        begin = start * 3
+        end = begin + len(pixels)
+
+        if start < 0 or end > len(data):
+            raise IndexError("LEDs {0}..{1} are out of range for channel {2}".format(start, start + len(pixels) // 3 - 1, channel))
+
+        if data[begin:end] != pixels:
+            data[begin:end] = pixels
+            self._dirty[channel] = True
+
+    def fill(self, channel, color):
+        """
+        Set all pixels of the channel to the same color.
+
+        @type channel: int
+        @param channel: R, G or B channel
+        @type color: (int, int, int)
+        @param color: R, G and B values
+        """
+        r, g, b = color
+        self._write(channel, 0, bytearray([int(g), int(r), int(b)]) * (len(self.data[channel]) // 3))
+
+    def set_range(self, channel, start, colors):
+        """
+        Set the colors of consecutive pixels.
+
+        @type channel: int
+        @param channel: R, G or B channel
+        @type start: int
+        @param start: the index of the first LED to set
+        @type colors: [(int, int, int)]
+        @param colors: R, G and B values for each LED
+        """
+        self._write(channel, start, bytearray([int(value) for r, g, b in colors for value in (g, r, b)]))
+
+    def set_pixels(self, channel, buffer, format='rgb', start=0):
+        """
+        Set the colors of consecutive pixels from packed color data.
+
+        @type channel: int
+        @param channel: R, G or B channel
+        @type buffer: bytes, bytearray, memoryview or array('B')
+        @param buffer: 3 bytes for each LED
+        @type format: str
+        @param format: "rgb" or "grb", the order of the color bytes in buffer
+        @type start: int
+        @param start: the index of the first LED to set
+        """
+        if format == 'rgb':
+            buffer = _swap_red_green(buffer)
+        elif format != 'grb':
+            raise BlinkStickException("Unsupported pixel format %s" % format)
+
+        self._write(channel, start, buffer)
+
+    def clear(self):
+        """
+        Set all pixels to black in the frame buffer.
+        """
+        for channel in range(0, 3):
+            self._write(channel, 0, bytearray(len(self.data[channel])))
+
+    def off(self):
+        """
+        Set all pixels to black in on the device.
+        """
+        self.clear()
+        self.send_data_all(force=True)
+
+    def connect(self, serial=None):
+        """
+        Connect to the first BlinkStick found
+
+        @type serial: str
+        @param serial: Select the serial number of BlinkStick
+        """
+
+        if serial is None:
+            self.bstick = find_first()
+        else:
+            self.bstick = find_by_serial(serial=serial)
+
+        return self.bstick is not None
+
+    def send_data(self, channel):
+        """
+        Send data stored in the internal buffer to the channel.
+
+        @param channel:
+            - 0 - R pin on BlinkStick Pro board
+            - 1 - G pin on BlinkStick Pro board
+            - 2 - B pin on BlinkStick Pro board
+        """
+        if self._send_channel(channel, self._channel_data(channel)):
+            self._dirty[channel] = False
+
+    def _send_channel(self, channel, packet_data):
+        try:
+            self.bstick.set_led_data(channel, packet_data)
+            time.sleep(self.data_transmission_delay)
+            return True
+        except Exception as e:
+            print("Exception: {0}".format(e))
+            return False
+
+    def _channel_data(self, channel):
+        return self._apply_color_tables(channel, self.data[channel])
+
+    def _wire_frame(self):
+        # the data send_data_all would send for the current frame buffer
+        counts = [self.r_led_count, self.g_led_count, self.b_led_count]
+        return tuple(bytes(self._channel_data(channel)) if counts[channel] > 0 else None
+                     for channel in range(0, 3))
+
+    def send_wire_frame(self, frame, paced=True):
+        """
+        Send a frame prepared in advance, for example by L{images.load}, without
+        modifying the internal frame buffer. The frame is paced by L{target_fps}
+        and counted in L{frame_stats} like frames sent with L{send_data_all}.
+
+        @type frame: tuple
+        @param frame: data to send to R, G and B channels in GRB order with the color
+            tables already applied, None for channels which are not sent
+        @type paced: bool
+        @param paced: False to send the frame immediately regardless of L{target_fps},
+            when the caller times the frames itself
+        """
+        late = False
+        dropped = 0
+
+        if self.target_fps and paced:
+            late, dropped = self._wait_for_deadline()
+
+        for channel, data in enumerate(frame):
+            if data is not None:
+                self._send_channel(channel, data)
+                # the device no longer shows the frame buffer
+                self._dirty[channel] = True
+
+        if self.recorder is not None:
+            self.recorder.write_frame(frame)
+
+        self.frame_stats._record(_monotonic(), late, dropped)
+        self.fps_count = self.frame_stats.fps
+
+    def _apply_color_tables(self, channel, data):
+        table_r, table_g, table_b = _color_tables(self.max_rgb_value, self.gamma, self.white_balance)
+
+        if table_r is _IDENTITY_TABLE and table_g is _IDENTITY_TABLE and table_b is _IDENTITY_TABLE:
+            return memoryview(data)
+
+        wire = self._wire[channel]
+        if len(wire) != len(data):
+            wire = self._wire[channel] = bytearray(len(data))
+
+        if table_r is table_g and table_g is table_b:
+            wire[:] = data.translate(table_r)
+        else:
+            # data is in GRB order
+            wire[0::3] = data[0::3].translate(table_g)
+            wire[1::3] = data[1::3].translate(table_r)
+            wire[2::3] = data[2::3].translate(table_b)
+
+        return memoryview(wire)
+
+    def set_max_rgb_value(self, value):
+        """
+        Set RGB color limit applied to all pixels when the data is sent.
+
+        @type  value: int
+        @param value: 0..255 maximum value for each R, G and B color
+        """
+        self.max_rgb_value = value
+
+    def set_gamma(self, value):
+        """
+        Set gamma correction applied to all pixels when the data is sent.
+
+        @type  value: float
+        @param value: gamma exponent, 1.0 to disable correction, 2.2 - 2.8 is typical for WS2812 LEDs
+        """
+        self.gamma = value
+
+    def set_white_balance(self, red=1.0, green=1.0, blue=1.0):
+        """
+        Set white balance applied to all pixels when the data is sent.
+
+        @type  red: float
+        @param red: 0..1 scale factor for red
+        @type  green: float
+        @param green: 0..1 scale factor for green
+        @type  blue: float
+        @param blue: 0..1 scale factor for blue
+        """
+        self.white_balance = (red, green, blue)
+
+    def send_data_all(self, force=False):
+        """
+        Send data to all channels which changed since they were last sent.
+
+        Changes are tracked by L{set_color}, so use force if L{data} has been
+        modified directly. Unchanged channels are also sent every
+        L{full_refresh_interval} seconds if it is set.
+
+        If L{target_fps} is set, the call waits for the next frame deadline
+        before sending. Frames which miss their deadline are sent immediately
+        and the deadlines skipped are counted as dropped in L{frame_stats}.
+
+        @type force: bool
+        @param force: send all channels regardless of whether they changed
+        """
+        late = False
+        dropped = 0
+
+        if self.target_fps:
+            late, dropped = self._wait_for_deadline()
+
+        sent = [None, None, None]
+        for channel in self._channels_to_send(force):
+            sent[channel] = self._channel_data(channel)
+            if self._send_channel(channel, sent[channel]):
+                self._dirty[channel] = False
+
+        if self.recorder is not None:
+            self.recorder.write_frame(sent)
+
+        self.frame_stats._record(_monotonic(), late, dropped)
+        self.fps_count = self.frame_stats.fps
+
+    def _channels_to_send(self, force):
+        tables = _color_tables(self.max_rgb_value, self.gamma, self.white_balance)
+        if tables is not self._sent_color_tables:
+            # brightness, gamma or white balance changed, so every pixel looks different
+            force = True
+            self._sent_color_tables = tables
+
+        if self.full_refresh_interval is not None:
+            now = _monotonic()
+            if force or self._last_full_refresh is None or \
+                    now - self._last_full_refresh >= self.full_refresh_interval:
+                force = True
+                self._last_full_refresh = now
+
+        counts = [self.r_led_count, self.g_led_count, self.b_led_count]
+
+        return [channel for channel in range(0, 3)
+                if counts[channel] > 0 and (force or self._dirty[channel])]
+
+    def _wait_for_deadline(self):
+        period = 1.0 / self.target_fps
+        now = _monotonic()
+
+        if self._next_deadline is None:
+            self._next_deadline = now
+
+        if now < self._next_deadline:
+            _sleep_until(self._next_deadline)
+            self._next_deadline += period
+            return False, 0
+
+        # the frame is late if it is sent after its deadline, and all the frames
+        # which missed their deadlines too are coalesced into it and dropped,
+        # continuing on the original schedule
+        late = now > self._next_deadline
+        missed = int((now - self._next_deadline) / period)
+        self._next_deadline += (missed + 1) * period
+        return late, missed
+
+    def set_target_fps(self, fps):
+        """
+        Pace L{send_data_all} to the specified frame rate. Deadlines are absolute,
+        so the time spent transferring data is included in the frame time.
+
+        @type fps: float
+        @param fps: target frames per second, or None to send as soon as called
+        """
+        self.target_fps = fps
+        self._next_deadline = None
+        self.frame_stats.reset()
+
+    def set_full_refresh_interval(self, interval):
+        """
+        Set how often L{send_data_all} sends all channels, including the ones
+        which have not changed.
+
+        @type interval: float
+        @param interval: interval in seconds, or None to send only changed channels
+        """
+        self.full_refresh_interval = interval
+        self._last_full_refresh = None
+
+    def start_sender(self):
+        """
+        Start a background thread which sends frames passed to it with L{present}.
+
+        While the sender is running, the frame buffer can be modified for the next
+        frame while the previous one is being transferred. L{send_data} and
+        L{send_data_all} must not be called until L{stop_sender} is called.
+        """
+        if self._sender is not None:
+            return
+
+        counts = [self.r_led_count, self.g_led_count, self.b_led_count]
+        self._front = [bytearray(count * 3) for count in counts]
+        self._back = [bytearray(count * 3) for count in counts]
+        self._pending = [False, False, False]
+
+        self._sender_running = True
+        self._sender = threading.Thread(target=self._sender_loop, name="BlinkStickPro sender")
+        self._sender.daemon = True
+        self._sender.start()
+
+    def stop_sender(self):
+        """
+        Send the last presented frame and stop the background sender thread.
+        """
+        if self._sender is None:
+            return
+
+        with self._frame_ready:
+            self._sender_running = False
+            self._frame_ready.notify()
+
+        self._sender.join()
+        self._sender = None
+
+    def present(self, force=False):
+        """
+        Hand the current frame buffer over to the background sender and return
+        immediately. If the sender is still busy with an earlier frame which has
+        not been sent yet, that frame is replaced by this one.
+
+        Sends the data with L{send_data_all} if the sender is not running.
+
+        @type force: bool
+        @param force: send all channels regardless of whether they changed
+        """
+        if self._sender is None:
+            self.send_data_all(force=force)
+            return
+
+        frame = [(channel, self._channel_data(channel)) for channel in self._channels_to_send(force)]
+
+        with self._frame_ready:
+            for channel, data in frame:
+                self._back[channel][:] = data
+                self._pending[channel] = True
+                self._dirty[channel] = False
+
+            self._frame_ready.notify()
+
+    def _sender_loop(self):
+        while True:
+            with self._frame_ready:
+                while self._sender_running and not any(self._pending):
+                    self._frame_ready.wait()
+
+                if not any(self._pending):
+                    return
+
+                self._front, self._back = self._back, self._front
+                pending = self._pending
+                self._pending = [False, False, False]
+
+            late = False
+            dropped = 0
+
+            if self.target_fps:
+                late, dropped = self._wait_for_deadline()
+
+            for channel in range(0, 3):
+                if pending[channel]:
+                    self._send_channel(channel, self._front[channel])
+
+            if self.recorder is not None:
+                self.recorder.write_frame([self._front[channel] if pending[channel] else None
+                                           for channel in range(0, 3)])
+
+            self.frame_stats._record(_monotonic(), late, dropped)
+            self.fps_count = self.frame_stats.fps
+
+class MatrixLayout(object):
+    """
+    MatrixLayout describes how the LEDs of a matrix connected to one channel of
+    BlinkStick Pro are wired. By default the LEDs are wired row by row starting
+    at the top left corner, which is how L{BlinkStickProMatrix} has always sent
+    the data.
+
+    The matrix can also be built from several panels chained one after another,
+    for example a channel with 16 columns and 8 rows made of two 8x8 panels:
+
+        >>> layout = MatrixLayout(serpentine=True, panel_columns=8, panel_rows=8)
+        >>> matrix = BlinkStickProMatrix(r_columns=16, r_rows=8, layouts=[layout])
+    """
+
+    def __init__(self, serpentine=False, rotation=0, mirror_x=False, mirror_y=False,
+                 panel_columns=None, panel_rows=None, panels=None):
+        """
+        Initialize MatrixLayout class.
+
+        @type serpentine: bool
+        @param serpentine: every other row of LEDs runs in the opposite direction (zig-zag wiring)
+        @type rotation: int
+        @param rotation: clockwise rotation of each panel in degrees: 0, 90, 180 or 270
+        @type mirror_x: bool
+        @param mirror_x: mirror each panel horizontally
+        @type mirror_y: bool
+        @param mirror_y: mirror each panel vertically
+        @type panel_columns: int
+        @param panel_columns: number of columns of each panel, the width of the matrix if not supplied
+        @type panel_rows: int
+        @param panel_rows: number of rows of each panel, the height of the matrix if not supplied
+        @type panels: list
+        @param panels: (x, y) location of the top left corner of each panel in the order
+            the panels are chained. Panels are chained row by row from the top left
+            corner of the matrix if not supplied.
+        """
+        if rotation not in (0, 90, 180, 270):
+            raise BlinkStickException("Unsupported rotation %s" % rotation)
+
+        self.serpentine = serpentine
+        self.rotation = rotation
+        self.mirror_x = mirror_x
+        self.mirror_y = mirror_y
+        self.panel_columns = panel_columns
+        self.panel_rows = panel_rows
+        self.panels = panels
+
+    def _key(self):
+        return (self.serpentine, self.rotation, self.mirror_x, self.mirror_y,
+                self.panel_columns, self.panel_rows, tuple(self.panels) if self.panels is not None else None)
+
+    def _panel_pixels(self, width, height):
+        # wiring of a panel before it is rotated
+        wired_width = height if self.rotation in (90, 270) else width
+
+        for i in range(0, width * height):
+            wx = i % wired_width
+            wy = i // wired_width
+
+            if self.serpentine and wy % 2:
+                wx = wired_width - 1 - wx
+
+            if self.rotation == 0:
+                x, y = wx, wy
+            elif self.rotation == 90:
+                x, y = width - 1 - wy, wx
+            elif self.rotation == 180:
+                x, y = width - 1 - wx, height - 1 - wy
+            else:
+                x, y = wy, height - 1 - wx
+
+            if self.mirror_x:
+                x = width - 1 - x
+            if self.mirror_y:
+                y = height - 1 - y
+
+            yield x, y
+
+    def pixel_map(self, columns, rows):
+        """
+        Map the LEDs of a matrix to their location.
+
+        @type columns: int
+        @param columns: number of columns of the matrix
+        @type rows: int
+        @param rows: number of rows of the matrix
+        @rtype: list
+        @return: (x, y) location of each LED in the order they are wired
+        """
+        if columns * rows == 0:
+            return []
+
+        width = self.panel_columns or columns
+        height = self.panel_rows or rows
+
+        panels = self.panels
+        if panels is None:
+            panels = [(x, y) for y in range(0, rows - height + 1, height)
+                      for x in range(0, columns - width + 1, width)]
+
+        if len(panels) * width * height != columns * rows:
+            raise BlinkStickException("Panels of the layout do not cover the %sx%s matrix" % (columns, rows))
+
+        pixels = []
+        for panel_x, panel_y in panels:
+            for x, y in self._panel_pixels(width, height):
+                pixels.append((panel_x + x, panel_y + y))
+
+        if len(set(pixels)) != len(pixels) or \
+                any(x < 0 or x >= columns or y < 0 or y >= rows for x, y in pixels):
+            raise BlinkStickException("Panels of the layout do not cover the %sx%s matrix" % (columns, rows))
+
+        return pixels
+
+
+class BlinkStickProMatrix(BlinkStickPro):
+    """
+    BlinkStickProMatrix class is specifically designed to control the individually
+    addressable LEDs connected to the device and arranged in a matrix. The tutorials section contains
+    all the details on how to connect them to BlinkStick Pro with matrices.
+
+    U{http://www.blinkstick.com/help/tutorials/blinkstick-pro-adafruit-neopixel-matrices}
+
+    Code example on how you can use this class are available here:
+
+    U{https://github.com/arvydas/blinkstick-python/wiki#code-examples-for-blinkstick-pro}
+
+    Matrix is driven by using L{BlinkStickProMatrix.set_color} with [x,y] coordinates and class automatically
+    divides data into subsets and sends it to the matrices.
+
+    For example, if you have 2 8x8 matrices connected to BlinkStickPro and you initialize
+    the class with
+
+        >>> matrix = BlinkStickProMatrix(r_columns=8, r_rows=8, g_columns=8, g_rows=8)
+
+    Then you can set the internal framebuffer by using {set_color} command:
+
+        >>> matrix.set_color(x=10, y=5, r=255, g=0, b=0)
+        >>> matrix.set_color(x=6, y=3, r=0, g=255, b=0)
+
+    And send data to both matrices in one go:
+
+        >>> matrix.send_data_all()
+
+    """
+
+    def __init__(self, r_columns=0, r_rows=0, g_columns=0, g_rows=0, b_columns=0, b_rows=0, delay=0.002, max_rgb_value=255,
+                 use_numpy=True, canvas_columns=None, canvas_rows=None, layouts=None):
+        """
+        Initialize BlinkStickProMatrix class.
+
+        @type r_columns: int
+        @param r_columns: number of matric columns for R channel
+        @type g_columns: int
+        @param g_columns: number of matric columns for R channel
+        @type b_columns: int
+        @param b_columns: number of matric columns for R channel
+        @type delay: int
+        @param delay: default transmission delay between frames
+        @type max_rgb_value: int
+        @param max_rgb_value: maximum color value for RGB channels
+        @type use_numpy: bool
+        @param use_numpy: provide the framebuffer as a NumPy array in L{matrix_array} if NumPy is installed
+        @type canvas_columns: int
+        @param canvas_columns: number of columns of the internal framebuffer, at least the number of matrix columns
+        @type canvas_rows: int
+        @param canvas_rows: number of rows of the internal framebuffer, at least the number of matrix rows
+        @type layouts: MatrixLayout[]
+        @param layouts: wiring of the matrices connected to R, G and B channels, the
+            default L{MatrixLayout} is used for missing or None entries
+        """
+        r_leds = r_columns * r_rows
+        g_leds = g_columns * g_rows
+        b_leds = b_columns * b_rows
+
+        self.r_columns = r_columns
+        self.r_rows = r_rows
+        self.g_columns = g_columns
+        self.g_rows = g_rows
+        self.b_columns = b_columns
+        self.b_rows = b_rows
+
+        super(BlinkStickProMatrix, self).__init__(r_led_count=r_leds, g_led_count=g_leds, b_led_count=b_leds, delay=delay, max_rgb_value=max_rgb_value)
+
+        self.rows = max(r_rows, g_rows, b_rows)
+        self.cols = r_columns + g_columns + b_columns
+
+        # the internal framebuffer can be larger than the matrix, the matrix
+        # displays the part of it starting at scroll_x:scroll_y
+        self.canvas_cols = max(self.cols, canvas_columns or 0)
+        self.canvas_rows = max(self.rows, canvas_rows or 0)
+        self.scroll_x = 0
+        self.scroll_y = 0
+
+        # initialise data store for matrix pre-populated with zeroes,
+        # each pixel takes 3 bytes in GRB order
+        self.matrix_data = bytearray(self.canvas_rows * self.canvas_cols * 3)
+
+        # (rows, cols, 3) uint8 view of matrix_data in GRB order. All operations
+        # on matrix_data are done in place so the view always stays valid.
+        self.matrix_array = None
+        if use_numpy and numpy is not None:
+            self.matrix_array = numpy.frombuffer(self.matrix_data, dtype=numpy.uint8).reshape(self.canvas_rows, self.canvas_cols, 3)
+
+        # runs of LEDs on each channel which are next to each other in the matrix,
+        # computed once so sending a channel only copies slices of matrix_data
+        layouts = list(layouts or [])
+        layouts += [None] * (3 - len(layouts))
+        self.layouts = [layout or MatrixLayout() for layout in layouts]
+
+        columns = [r_columns, g_columns, b_columns]
+        rows = [r_rows, g_rows, b_rows]
+        self._channel_runs = []
+        # matrix coordinates of each LED, by channel and LED index
+        self._channel_pixels = []
+        for channel in range(0, 3):
+            start_col = sum(columns[:channel])
+            pixels = [(start_col + x, y) for x, y in self.layouts[channel].pixel_map(columns[channel], rows[channel])]
+            self._channel_pixels.append(pixels)
+            self._channel_runs.append(_pixel_runs(pixels))
+
+    def set_color(self, x, y, r, g, b, remap_values=True):
+        """
+        Set the color of a single pixel in the internal framebuffer.
+
+        @type x: int
+        @param x: the x location in the matrix
+        @type y: int
+        @param y: the y location in the matrix
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type remap_values: bool
+        @param remap_values: Colors are remapped based on the {max_rgb_value}, gamma and
+            white balance when the data is sent. Set to False for values which are already
+            remapped and are sent as they are.
+        """
+
+        r, g, b = self._unmapped_color(r, g, b, remap_values)
+
+        data = self.matrix_data
+        i = self._coord_to_index(x, y) * 3
+        if data[i] != g or data[i + 1] != r or data[i + 2] != b:
+            data[i] = g
+            data[i + 1] = r
+            data[i + 2] = b
+            x = (x - self.scroll_x) % self.canvas_cols
+            if x < self.cols:
+                self._dirty[self._column_to_channel(x)] = True
+
+    def _coord_to_index(self, x, y):
+        return y * self.canvas_cols + x
+
+    def _column_to_channel(self, x):
+        if x < self.r_columns:
+            return 0
+        elif x < self.r_columns + self.g_columns:
+            return 1
+        else:
+            return 2
 
     def get_color(self, x, y):
         """
@@ -1236,8 +2588,59 @@ class BlinkStickProMatrix(BlinkStickPro):
         @return: 3-tuple for R, G and B values
         """
 
-        val = self.matrix_data[self._coord_to_index(x, y)]
-        return [val[1], val[0], val[2]]
+        data = self.matrix_data
+        i = self._coord_to_index(x, y) * 3
+        return [data[i + 1], data[i], data[i + 2]]
+
+    def _mark_all_dirty(self):
+        for channel in range(0, 3):
+            self._dirty[channel] = True
+
+    def roll(self, dx, dy):
+        """
+        Move all LED values in the matrix by dx columns and dy rows. Pixels moved
+        off one edge of the matrix reappear on the opposite edge.
+
+        @type dx: int
+        @param dx: number of columns to move right, negative values move left
+        @type dy: int
+        @param dy: number of rows to move down, negative values move up
+        """
+        if self.canvas_rows == 0 or self.canvas_cols == 0:
+            return
+
+        dx %= self.canvas_cols
+        dy %= self.canvas_rows
+
+        if self.matrix_array is not None:
+            self.matrix_array[...] = numpy.roll(self.matrix_array, (dy, dx), axis=(0, 1))
+        else:
+            data = self.matrix_data
+            row_size = self.canvas_cols * 3
+
+            if dx:
+                split = row_size - dx * 3
+                for start in range(0, len(data), row_size):
+                    row = data[start:start + row_size]
+                    data[start:start + row_size] = row[split:] + row[:split]
+
+            if dy:
+                split = len(data) - dy * row_size
+                data[:] = data[split:] + data[:split]
+
+        self._mark_all_dirty()
+
+    def _clear_column(self, x):
+        if self.matrix_array is not None:
+            self.matrix_array[:, x] = 0
+        else:
+            for y in range(0, self.canvas_rows):
+                i = self._coord_to_index(x, y) * 3
+                self.matrix_data[i:i + 3] = _ZERO_PADDING[:3]
+
+    def _clear_row(self, y):
+        start = self._coord_to_index(0, y) * 3
+        self.matrix_data[start:start + self.canvas_cols * 3] = bytearray(self.canvas_cols * 3)
 
     def shift_left(self, remove=False):
         """
@@ -1246,24 +2649,10 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type remove: bool
         @param remove: whether to remove the pixels on the last column or move the to the first column
         """
-        if not remove:
-            temp = []
-            for y in range(0, self.rows):
-                temp.append(self.get_color(0, y))
-
-        for y in range(0, self.rows):
-            for x in range(0, self.cols - 1):
-                r, g, b = self.get_color(x + 1, y)
-
-                self.set_color(x, y, r, g, b, False)
+        self.roll(-1, 0)
 
         if remove:
-            for y in range(0, self.rows):
-                self.set_color(self.cols - 1, y, 0, 0, 0, False)
-        else:
-            for y in range(0, self.rows):
-                col = temp[y]
-                self.set_color(self.cols - 1, y, col[0], col[1], col[2], False)
+            self._clear_column(self.canvas_cols - 1)
 
     def shift_right(self, remove=False):
         """
@@ -1272,25 +2661,10 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type remove: bool
         @param remove: whether to remove the pixels on the last column or move the to the first column
         """
-
-        if not remove:
-            temp = []
-            for y in range(0, self.rows):
-                temp.append(self.get_color(self.cols - 1, y))
-
-        for y in range(0, self.rows):
-            for x in reversed(range(1, self.cols)):
-                r, g, b = self.get_color(x - 1, y)
-
-                self.set_color(x, y, r, g, b, False)
+        self.roll(1, 0)
 
         if remove:
-            for y in range(0, self.rows):
-                self.set_color(0, y, 0, 0, 0, False)
-        else:
-            for y in range(0, self.rows):
-                col = temp[y]
-                self.set_color(0, y, col[0], col[1], col[2], False)
+            self._clear_column(0)
 
     def shift_down(self, remove=False):
         """
@@ -1299,25 +2673,10 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type remove: bool
         @param remove: whether to remove the pixels on the last column or move the to the first column
         """
-
-        if not remove:
-            temp = []
-            for x in range(0, self.cols):
-                temp.append(self.get_color(x, self.rows - 1))
-
-        for y in reversed(range(1, self.rows)):
-            for x in range(0, self.cols):
-                r, g, b = self.get_color(x, y - 1)
-
-                self.set_color(x, y, r, g, b, False)
+        self.roll(0, 1)
 
         if remove:
-            for x in range(0, self.cols):
-                self.set_color(x, 0, 0, 0, 0, False)
-        else:
-            for x in range(0, self.cols):
-                col = temp[x]
-                self.set_color(x, 0, col[0], col[1], col[2], False)
+            self._clear_row(0)
 
     def shift_up(self, remove=False):
         """
@@ -1326,25 +2685,176 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type remove: bool
         @param remove: whether to remove the pixels on the last column or move the to the first column
         """
+        self.roll(0, -1)
 
-        if not remove:
-            temp = []
-            for x in range(0, self.cols):
-                temp.append(self.get_color(x, 0))
+        if remove:
+            self._clear_row(self.canvas_rows - 1)
 
-        for x in range(0, self.cols):
-            for y in range(0, self.rows - 1):
-                r, g, b = self.get_color(x, y + 1)
+    def _write(self, channel, start, pixels):
+        # LEDs addressed by channel and index, as with BlinkStickPro.fill, set_range
+        # and set_pixels, are written to the pixels of the framebuffer they show
+        leds = self._channel_pixels[channel]
+        count = len(pixels) // 3
 
-                self.set_color(x, y, r, g, b, False)
+        if start < 0 or start + count > len(leds):
+            raise IndexError("LEDs {0}..{1} are out of range for channel {2}".format(start, start + count - 1, channel))
 
-        if remove:
-            for x in range(0, self.cols):
-                self.set_color(x, self.rows - 1, 0, 0, 0, False)
+        data = self.matrix_data
+        changed = False
+        for i in range(0, count):
+            x, y = leds[start + i]
+            j = self._coord_to_index((x + self.scroll_x) % self.canvas_cols, (y + self.scroll_y) % self.canvas_rows) * 3
+            pixel = pixels[i * 3:i * 3 + 3]
+            if data[j:j + 3] != pixel:
+                data[j:j + 3] = pixel
+                changed = True
+
+        if changed:
+            self._dirty[channel] = True
+
+    def fill_canvas(self, r, g, b):
+        """
+        Set all pixels in the internal framebuffer to the same color. Use
+        L{BlinkStickPro.fill} to fill the matrix of a single channel.
+
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        """
+        if self.matrix_array is not None:
+            self.matrix_array[...] = (g, r, b)
+        else:
+            self.matrix_data[:] = bytearray([g, r, b]) * (self.canvas_rows * self.canvas_cols)
+
+        self._mark_all_dirty()
+
+    def scale_brightness(self, factor):
+        """
+        Multiply all color values in the internal framebuffer by factor.
+
+        @type factor: float
+        @param factor: brightness multiplier, e.g. 0.5 for half the brightness
+        """
+        table = bytearray([min(255, int(value * factor)) for value in range(0, 256)])
+        # translate creates a new buffer, copy it back so the NumPy view stays valid
+        self.matrix_data[:] = self.matrix_data.translate(table)
+
+        self._mark_all_dirty()
+
+    def set_frame(self, frame):
+        """
+        Replace the whole internal framebuffer.
+
+        @type frame: numpy.ndarray or list
+        @param frame: (canvas_rows, canvas_cols, 3) array or nested lists of R, G and B
+            values, the size of the internal framebuffer which can be larger than the matrix
+        """
+        shape = (self.canvas_rows, self.canvas_cols, 3)
+
+        if self.matrix_array is not None:
+            frame = numpy.asarray(frame, dtype=numpy.uint8)
+            if frame.shape != shape:
+                raise BlinkStickException("Frame of shape %s does not match the framebuffer of shape %s" % (frame.shape, shape))
+            self.matrix_array[...] = frame[..., [1, 0, 2]]
         else:
-            for x in range(0, self.cols):
-                col = temp[x]
-                self.set_color(x, self.rows - 1, col[0], col[1], col[2], False)
+            if len(frame) != self.canvas_rows or any(len(row) != self.canvas_cols for row in frame) or \
+                    any(len(pixel) != 3 for row in frame for pixel in row):
+                raise BlinkStickException("Frame does not match the framebuffer of shape %s" % (shape,))
+
+            data = self.matrix_data
+            i = 0
+            for row in frame:
+                for r, g, b in row:
+                    data[i] = g
+                    data[i + 1] = r
+                    data[i + 2] = b
+                    i += 3
+
+        self._mark_all_dirty()
+
+    def _mark_columns_dirty(self, x1, x2):
+        if self.scroll_x or self.canvas_cols != self.cols:
+            self._mark_all_dirty()
+            return
+
+        for channel in range(self._column_to_channel(x1), self._column_to_channel(x2) + 1):
+            self._dirty[channel] = True
+
+    def fill_rect(self, x1, y1, x2, y2, r, g, b):
+        """
+        Fill a rectangle with it's corners at x1:y1 and x2:y2
+
+        @type x1: int
+        @param x1: the x1 location in the matrix for first corner of the rectangle
+        @type y1: int
+        @param y1: the y1 location in the matrix for first corner of the rectangle
+        @type x2: int
+        @param x2: the x2 location in the matrix for second corner of the rectangle
+        @type y2: int
+        @param y2: the y2 location in the matrix for second corner of the rectangle
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        """
+        x1, x2 = max(0, min(x1, x2)), min(self.canvas_cols - 1, max(x1, x2))
+        y1, y2 = max(0, min(y1, y2)), min(self.canvas_rows - 1, max(y1, y2))
+
+        if x1 > x2 or y1 > y2:
+            return
+
+        row = bytearray([int(g), int(r), int(b)]) * (x2 - x1 + 1)
+        for y in range(y1, y2 + 1):
+            start = self._coord_to_index(x1, y) * 3
+            self.matrix_data[start:start + len(row)] = row
+
+        self._mark_columns_dirty(x1, x2)
+
+    def blit(self, x, y, image, width=None, format='rgb'):
+        """
+        Copy an image into the internal framebuffer with it's top left corner at x:y.
+        Parts of the image outside of the matrix are skipped.
+
+        @type x: int
+        @param x: the x location in the matrix for the left of the image
+        @type y: int
+        @param y: the y location in the matrix for the top of the image
+        @type image: bytes, bytearray, memoryview, array('B'), numpy.ndarray or list
+        @param image: packed color data with 3 bytes per pixel and rows of width pixels,
+            or a (rows, cols, 3) array or nested lists of color values
+        @type width: int
+        @param width: width of the image in pixels, required for packed color data
+        @type format: str
+        @param format: "rgb" or "grb", the order of the color values in image
+        """
+        image, width = primitives.grb_pixels(image, width, format)
+
+        if width <= 0:
+            return
+
+        height = len(image) // (width * 3)
+
+        # clip the image to the matrix
+        left = max(0, -x)
+        right = min(width, self.canvas_cols - x)
+        top = max(0, -y)
+        bottom = min(height, self.canvas_rows - y)
+
+        if left >= right or top >= bottom:
+            return
+
+        image = memoryview(image)
+        for row in range(top, bottom):
+            src = (row * width + left) * 3
+            dst = self._coord_to_index(x + left, y + row) * 3
+            self.matrix_data[dst:dst + (right - left) * 3] = image[src:src + (right - left) * 3]
+
+        self._mark_columns_dirty(x + left, x + right - 1)
 
     def number(self, x, y, n, r, g, b):
         """
@@ -1355,7 +2865,7 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type y: int
         @param y: the y location in the matrix (top of the number)
         @type n: int
-        @param n: number digit to render 0..9
+        @param n: number to render, digits are separated by one blank column
         @type r: int
         @param r: red color byte
         @type g: int
@@ -1363,62 +2873,113 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type b: int
         @param b: blue color byte
         """
-        if n == 0:
-            self.rectangle(x, y, x + 2, y + 4, r, g, b)
-        elif n == 1:
-            self.line(x + 1, y, x + 1, y + 4, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x, y + 1, r, g, b)
-        elif n == 2:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x + 2, y + 1, r, g, b)
-            self.set_color(x, y + 3, r, g, b)
-        elif n == 3:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x + 2, y + 1, r, g, b)
-            self.set_color(x + 2, y + 3, r, g, b)
-        elif n == 4:
-            self.line(x, y, x, y + 2, r, g, b)
-            self.line(x + 2, y, x + 2, y + 4, r, g, b)
-            self.set_color(x + 1, y + 2, r, g, b)
-        elif n == 5:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x, y + 1, r, g, b)
-            self.set_color(x + 2, y + 3, r, g, b)
-        elif n == 6:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x, y + 1, r, g, b)
-            self.set_color(x + 2, y + 3, r, g, b)
-            self.set_color(x, y + 3, r, g, b)
-        elif n == 7:
-            self.line(x + 1, y + 2, x + 1, y + 4, r, g, b)
-            self.line(x, y, x + 2, y, r, g, b)
-            self.set_color(x + 2, y + 1, r, g, b)
-        elif n == 8:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x, y + 1, r, g, b)
-            self.set_color(x + 2, y + 1, r, g, b)
-            self.set_color(x + 2, y + 3, r, g, b)
-            self.set_color(x, y + 3, r, g, b)
-        elif n == 9:
-            self.line(x, y, x + 2, y, r, g, b)
-            self.line(x, y + 2, x + 2, y + 2, r, g, b)
-            self.line(x, y + 4, x + 2, y + 4, r, g, b)
-            self.set_color(x, y + 1, r, g, b)
-            self.set_color(x + 2, y + 1, r, g, b)
-            self.set_color(x + 2, y + 3, r, g, b)
-
-    def rectangle(self, x1, y1, x2, y2, r, g, b):
+        self.text(x, y, str(n), r, g, b, font=fonts.FONT_3X5)
+
+    def text(self, x, y, string, r, g, b, font=None, spacing=1):
+        """
+        Render a string at location x,y and r,g,b color. Only the pixels of the
+        glyphs are set, the background is left unchanged.
+
+        @type x: int
+        @param x: the x location in the matrix (left of the text)
+        @type y: int
+        @param y: the y location in the matrix (top of the text)
+        @type string: str
+        @param string: the text to render, lines are separated with newlines
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type font: fonts.BitmapFont
+        @param font: the font to use, L{fonts.FONT_5X7} if not supplied
+        @type spacing: int
+        @param spacing: number of blank columns between characters
+        """
+        font = font or fonts.DEFAULT_FONT
+        r, g, b = int(r), int(g), int(b)
+        advance = font.width + spacing
+
+        for line_number, line in enumerate(string.split("\n")):
+            top = y + line_number * (font.height + 1)
+
+            for i, char in enumerate(line):
+                left = x + i * advance
+                if left < self.canvas_cols and left + font.width > 0:
+                    self._draw_runs(left, top, font.colored_runs(char, r, g, b))
+
+        width, height = font.measure(string, spacing)
+        self._mark_area_dirty(x, y, width, height)
+
+    def _draw_runs(self, x, y, runs):
+        # copy (x, y, pixels) runs relative to x:y to the framebuffer
+        data = self.matrix_data
+        canvas_cols = self.canvas_cols
+        canvas_rows = self.canvas_rows
+
+        for run_x, run_y, pixels in runs:
+            row = y + run_y
+            if row < 0 or row >= canvas_rows:
+                continue
+
+            # clip the run to the framebuffer
+            start = x + run_x
+            skip = max(0, -start)
+            end = min(canvas_cols, start + len(pixels) // 3)
+            if start + skip >= end:
+                continue
+
+            index = self._coord_to_index(start + skip, row) * 3
+            data[index:index + (end - start - skip) * 3] = pixels[skip * 3:(end - start) * 3]
+
+    def _mark_area_dirty(self, x, y, width, height):
+        if width > 0 and y < self.canvas_rows and y + height > 0:
+            x1 = max(0, x)
+            x2 = min(self.canvas_cols, x + width) - 1
+            if x1 <= x2:
+                self._mark_columns_dirty(x1, x2)
+
+    def _fill_spans(self, spans, r, g, b):
+        # set the (y, x1, x2) spans computed by the primitives module to one color
+        data = self.matrix_data
+        pixel = bytearray([int(g), int(r), int(b)])
+        left = self.canvas_cols
+        right = -1
+
+        for y, x1, x2 in spans:
+            if y < 0 or y >= self.canvas_rows:
+                continue
+
+            x1 = max(0, x1)
+            x2 = min(self.canvas_cols - 1, x2)
+            if x1 > x2:
+                continue
+
+            index = self._coord_to_index(x1, y) * 3
+            data[index:index + (x2 - x1 + 1) * 3] = pixel * (x2 - x1 + 1)
+            left = min(left, x1)
+            right = max(right, x2)
+
+        if left <= right:
+            self._mark_columns_dirty(left, right)
+
+    def measure(self, string, font=None, spacing=1):
+        """
+        Get the size of a string rendered with L{text}.
+
+        @type string: str
+        @param string: the text, lines are separated with newlines
+        @type font: fonts.BitmapFont
+        @param font: the font to use, L{fonts.FONT_5X7} if not supplied
+        @type spacing: int
+        @param spacing: number of blank columns between characters
+        @rtype: (int, int)
+        @return: width and height in pixels
+        """
+        return (font or fonts.DEFAULT_FONT).measure(string, spacing)
+
+    def rectangle(self, x1, y1, x2, y2, r, g, b, fill=False):
         """
         Draw a rectangle with it's corners at x1:y1 and x2:y2
 
@@ -1436,12 +2997,11 @@ class BlinkStickProMatrix(BlinkStickPro):
         @param g: green color byte
         @type b: int
         @param b: blue color byte
+        @type fill: bool
+        @param fill: whether to fill the rectangle or only draw the outline
         """
 
-        self.line(x1, y1, x1, y2, r, g, b)
-        self.line(x1, y1, x2, y1, r, g, b)
-        self.line(x2, y1, x2, y2, r, g, b)
-        self.line(x1, y2, x2, y2, r, g, b)
+        self._fill_spans(primitives.rectangle_spans(x1, y1, x2, y2, fill), r, g, b)
 
     def line(self, x1, y1, x2, y2, r, g, b):
         """
@@ -1462,89 +3022,199 @@ class BlinkStickProMatrix(BlinkStickPro):
         @type b: int
         @param b: blue color byte
         """
-        points = []
-        is_steep = abs(y2 - y1) > abs(x2 - x1)
-        if is_steep:
-            x1, y1 = y1, x1
-            x2, y2 = y2, x2
-        rev = False
-        if x1 > x2:
-            x1, x2 = x2, x1
-            y1, y2 = y2, y1
-            rev = True
-        delta_x = x2 - x1
-        delta_y = abs(y2 - y1)
-        error = int(delta_x / 2)
-        y = y1
-        y_step = None
-
-        if y1 < y2:
-            y_step = 1
-        else:
-            y_step = -1
-        for x in range(x1, x2 + 1):
-            if is_steep:
-                #print y, "~", x
-                self.set_color(y, x, r, g, b)
-                points.append((y, x))
-            else:
-                #print x, " ", y
-                self.set_color(x, y, r, g, b)
-                points.append((x, y))
-            error -= delta_y
-            if error < 0:
-                y += y_step
-                error += delta_x
-                # Reverse the list if the coordinates were reversed
-        if rev:
-            points.reverse()
+        points = primitives.line_points(x1, y1, x2, y2)
+        self._fill_spans(primitives.points_to_spans(points), r, g, b)
         return points
 
-    def clear(self):
+    def polyline(self, points, r, g, b, closed=False):
         """
-        Set all pixels to black in the cached matrix
+        Draw lines connecting the points
+
+        @type points: list
+        @param points: (x, y) locations in the matrix
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type closed: bool
+        @param closed: whether to connect the last point to the first one
         """
-        for y in range(0, self.rows):
-            for x in range(0, self.cols):
-                self.set_color(x, y, 0, 0, 0)
+        self._fill_spans(primitives.polyline_spans(points, closed), r, g, b)
 
-    def send_data(self, channel):
+    def circle(self, x, y, radius, r, g, b, fill=False):
         """
-        Send data stored in the internal buffer to the channel.
+        Draw a circle with it's center at x:y
 
-        @param channel:
-            - 0 - R pin on BlinkStick Pro board
-            - 1 - G pin on BlinkStick Pro board
-            - 2 - B pin on BlinkStick Pro board
+        @type x: int
+        @param x: the x location in the matrix for the center of the circle
+        @type y: int
+        @param y: the y location in the matrix for the center of the circle
+        @type radius: int
+        @param radius: radius of the circle
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type fill: bool
+        @param fill: whether to fill the circle or only draw the outline
+        """
+        self._fill_spans(primitives.circle_spans(x, y, radius, fill), r, g, b)
+
+    def ellipse(self, x, y, rx, ry, r, g, b, fill=False):
         """
+        Draw an ellipse with it's center at x:y
 
-        start_col = 0
-        end_col = 0
+        @type x: int
+        @param x: the x location in the matrix for the center of the ellipse
+        @type y: int
+        @param y: the y location in the matrix for the center of the ellipse
+        @type rx: int
+        @param rx: horizontal radius of the ellipse
+        @type ry: int
+        @param ry: vertical radius of the ellipse
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        @type fill: bool
+        @param fill: whether to fill the ellipse or only draw the outline
+        """
+        self._fill_spans(primitives.ellipse_spans(x, y, rx, ry, fill), r, g, b)
+
+    def flood_fill(self, x, y, r, g, b):
+        """
+        Fill the area around x:y which has the same color as x:y
+
+        @type x: int
+        @param x: the x location in the matrix to start filling from
+        @type y: int
+        @param y: the y location in the matrix to start filling from
+        @type r: int
+        @param r: red color byte
+        @type g: int
+        @param g: green color byte
+        @type b: int
+        @param b: blue color byte
+        """
+        spans = primitives.flood_spans(self.matrix_data, self.canvas_cols, self.canvas_rows, x, y)
+        self._fill_spans(spans, r, g, b)
+
+    def draw_sprite(self, x, y, sprite):
+        """
+        Draw a sprite with it's top left corner at x:y. Pixels outside of the mask
+        of the sprite are left unchanged.
+
+        @type x: int
+        @param x: the x location in the matrix for the left of the sprite
+        @type y: int
+        @param y: the y location in the matrix for the top of the sprite
+        @type sprite: primitives.Sprite
+        @param sprite: the sprite to draw
+        """
+        self._draw_runs(x, y, sprite.runs)
+        self._mark_area_dirty(x, y, sprite.width, sprite.height)
+
+    def scroll(self, dx, dy, wrap=True):
+        """
+        Move the part of the internal framebuffer displayed on the matrix by dx
+        columns and dy rows. Only the origin of the view is moved, so scrolling
+        takes the same time regardless of the size of the framebuffer. Create the
+        matrix with canvas_columns or canvas_rows larger than the matrix to render
+        long texts once and scroll them across the matrix.
+
+        @type dx: int
+        @param dx: number of columns to move the view right, the content moves left
+        @type dy: int
+        @param dy: number of rows to move the view down, the content moves up
+        @type wrap: bool
+        @param wrap: whether the view continues at the opposite edge of the framebuffer
+            or stops at the edge
+        """
+        self.scroll_to(self.scroll_x + dx, self.scroll_y + dy, wrap)
+
+    def scroll_to(self, x, y, wrap=True):
+        """
+        Display the part of the internal framebuffer starting at x:y on the matrix.
+
+        @type x: int
+        @param x: the x location in the framebuffer displayed in the left column of the matrix
+        @type y: int
+        @param y: the y location in the framebuffer displayed in the top row of the matrix
+        @type wrap: bool
+        @param wrap: whether the view continues at the opposite edge of the framebuffer
+            or stops at the edge
+        """
+        if self.canvas_rows == 0 or self.canvas_cols == 0:
+            return
+
+        if wrap:
+            x %= self.canvas_cols
+            y %= self.canvas_rows
+        else:
+            x = max(0, min(x, self.canvas_cols - self.cols))
+            y = max(0, min(y, self.canvas_rows - self.rows))
+
+        if x != self.scroll_x or y != self.scroll_y:
+            self.scroll_x = x
+            self.scroll_y = y
+            self._mark_all_dirty()
 
-        if channel == 0:
-            start_col = 0
-            end_col = self.r_columns
+    def clear(self):
+        """
+        Set all pixels to black in the cached matrix
+        """
+        self.matrix_data[:] = bytearray(len(self.matrix_data))
 
-        if channel == 1:
-            start_col = self.r_columns
-            end_col = start_col + self.g_columns
+        self._mark_all_dirty()
 
-        if channel == 2:
-            start_col = self.r_columns + self.g_columns
-            end_col = start_col + self.b_columns
+    def _channel_data(self, channel):
+        data = self.data[channel]
+        matrix_data = self.matrix_data
+        canvas_cols = self.canvas_cols
+        canvas_rows = self.canvas_rows
 
-        self.data[channel] = []
+        for offset, x, y, count, dx, dy in self._channel_runs[channel]:
+            x = (x + self.scroll_x) % canvas_cols
+            y = (y + self.scroll_y) % canvas_rows
 
-        #slice the huge array to individual packets
-        for y in range(0, self.rows):
-            start = y * self.cols + start_col
-            end = y * self.cols + end_col
+            while count:
+                # number of LEDs until the run crosses the edge of the framebuffer
+                if dx > 0:
+                    n = min(count, canvas_cols - x)
+                elif dx < 0:
+                    n = min(count, x + 1)
+                elif dy > 0:
+                    n = min(count, canvas_rows - y)
+                else:
+                    n = min(count, y + 1)
+
+                start = (y * canvas_cols + x) * 3
+                if dx == 1:
+                    data[offset * 3:(offset + n) * 3] = matrix_data[start:start + n * 3]
+                else:
+                    step = (dx + dy * canvas_cols) * 3
+                    for i in range(0, 3):
+                        stop = start + i + step * n
+                        data[offset * 3 + i:(offset + n) * 3:3] = \
+                            matrix_data[start + i:stop if stop >= 0 else None:step]
 
-            self.data[channel].extend(self.matrix_data[start: end])
+                offset += n
+                count -= n
+                x = (x + dx * n) % canvas_cols
+                y = (y + dy * n) % canvas_rows
 
-        super(BlinkStickProMatrix, self).send_data(channel)
+        return super(BlinkStickProMatrix, self)._channel_data(channel)
 
 def _find_blicksticks(find_all=True):
+    if virtual.is_enabled():
+        return virtual.find(find_all=find_all)
+
     if sys.platform == "win32":
         devices = hid.HidDeviceFilter(vendor_id = VENDOR_ID, product_id = PRODUCT_ID).get_devices()
         if find_all:
@@ -1558,6 +3228,18 @@ def _find_blicksticks(find_all=True):
         return usb.core.find(find_all=find_all, idVendor=VENDOR_ID, idProduct=PRODUCT_ID)
 
 
+def _find_blickstick_at(bus, address):
+    if virtual.is_enabled():
+        for d in virtual.find():
+            if d.bus == bus and d.address == address:
+                return d
+    elif sys.platform == "win32":
+        # HID devices have no bus address, find_by_serial scans for them
+        return None
+    else:
+        return usb.core.find(idVendor=VENDOR_ID, idProduct=PRODUCT_ID, bus=bus, address=address)
+
+
 def find_all():
     """
     Find all attached BlinkStick devices.
@@ -1593,49 +3275,260 @@ def find_by_serial(serial=None):
     @return: BlinkStick object or None if no devices are found
     """
 
-    devices = []
-    if sys.platform == "win32":
-        devices = [d for d in _find_blicksticks()
-                   if d.serial_number == serial]
-    else:
-        for d in _find_blicksticks():
+    # try the location the device was last seen at before scanning the whole bus
+    location = _device_locations.get(serial)
+    if location is not None:
+        d = _find_blickstick_at(*location)
+        if d is not None:
+            try:
+                stick = BlinkStick(device=d)
+                if stick.get_serial() == serial:
+                    return stick
+            except Exception:
+                pass
+
+        if _device_locations.get(serial) == location:
+            del _device_locations[serial]
+
+    return find_by_serials([serial])[0]
+
+
+def find_by_serials(serials):
+    """
+    Find BlinkStick devices based on serial numbers with a single scan of the bus.
+
+    @type  serials: str[]
+    @param serials: serial numbers of the devices to find
+    @rtype: BlinkStick[]
+    @return: BlinkStick objects in the same order as serials, None for the devices which were not found
+    """
+    found = dict((serial, None) for serial in serials)
+    remaining = len(found)
+
+    for d in _find_blicksticks():
+        if remaining == 0:
+            break
+
+        if _is_hid_device(d):
+            serial = d.serial_number
+        else:
             try:
-                if usb.util.get_string(d, 3, 1033) == serial:
-                    devices = [d]
-                    break
+                serial = _get_string(d, 3)
             except Exception as e:
                 print("{0}".format(e))
+                continue
+
+            _device_locations[serial] = (d.bus, d.address)
+
+        if serial in found and found[serial] is None:
+            found[serial] = BlinkStick(device=d)
+            remaining -= 1
+
+    return [found[serial] for serial in serials]
+
+
+def _is_hid_device(device):
+    return sys.platform == "win32" and not virtual.is_virtual(device)
+
+
+def _get_string(device, index):
+    if virtual.is_virtual(device):
+        return device.get_string(index)
+    else:
+        return usb.util.get_string(device, index, 1033)
+
+
+def _pixel_runs(pixels):
+    """
+    Split the list of pixel locations into runs of pixels next to each other
+    in the same direction.
+
+    @rtype: list
+    @return: (offset, x, y, count, dx, dy) tuples, where offset is the index of
+        the first pixel of the run in pixels
+    """
+    runs = []
+    i = 0
+    while i < len(pixels):
+        x, y = pixels[i]
+        count = 1
+        dx, dy = 1, 0
+
+        if i + 1 < len(pixels):
+            nx, ny = pixels[i + 1]
+            if abs(nx - x) + abs(ny - y) == 1:
+                dx, dy = nx - x, ny - y
+                while i + count < len(pixels) and pixels[i + count] == (x + dx * count, y + dy * count):
+                    count += 1
+
+        runs.append((i, x, y, count, dx, dy))
+        i += count
+
+    return runs
+
+
+def _sleep_until(deadline):
+    remaining = deadline - _monotonic()
+    if remaining > _SPIN_TIME:
+        time.sleep(remaining - _SPIN_TIME)
+
+    while _monotonic() < deadline:
+        pass
+
+
+def _swap_red_green(data):
+    # convert between RGB and GRB ordered pixel data
+    swapped = bytearray(data)
+    swapped[0::3] = data[1::3]
+    swapped[1::3] = data[0::3]
+    return swapped
+
+
+def _to_byte(value):
+    return max(0, min(255, int(round(value, 3))))
+
+
+_IDENTITY_TABLE = bytearray(range(0, 256))
+
+
+def _ease_linear(d):
+    return d
+
+
+def _ease_sine(d):
+    return (1 - math.cos(math.pi * d)) / 2
+
+
+def _ease_cubic(d):
+    if d < 0.5:
+        return 4 * d * d * d
+    return 1 - (2 - 2 * d) ** 3 / 2
+
+
+def _ease_exponential(d):
+    if d <= 0 or d >= 1:
+        return d
+    if d < 0.5:
+        return 2 ** (20 * d - 10) / 2
+    return 1 - 2 ** (10 - 20 * d) / 2
+
+
+# easing curves for morph and pulse, mapping the 0..1 progress of a transition
+# to the 0..1 position between its start and end color
+EASINGS = {
+    'linear': _ease_linear,
+    'sine': _ease_sine,
+    'cubic': _ease_cubic,
+    'exponential': _ease_exponential,
+}
+
+
+def _ease(easing, d):
+    try:
+        return EASINGS[easing](d)
+    except KeyError:
+        raise BlinkStickException("Unsupported easing %s" % easing)
+
+
+# gradients keyed by (start, end, steps, easing), most recently used last
+_gradient_cache = OrderedDict()
+_gradient_cache_lock = threading.Lock()
+_GRADIENT_CACHE_SIZE = 128
+
+
+def _gradient_table(start, end, steps, easing='linear'):
+    """
+    Get the colors of a transition from start to end color.
+
+    @rtype: bytes
+    @return: packed RGB values of steps + 2 colors, the start and end color included
+    """
+    key = (tuple(start), tuple(end), steps, easing)
+
+    with _gradient_cache_lock:
+        table = _gradient_cache.pop(key, None)
+        if table is not None:
+            _gradient_cache[key] = table
+            return table
+
+    values = bytearray()
+    for n in range(0, steps + 2):
+        d = _ease(easing, 1.0 * n / (steps + 1))
+        values.extend(_to_byte(s * (1 - d) + e * d) for s, e in zip(start, end))
+    table = bytes(values)
+
+    with _gradient_cache_lock:
+        _gradient_cache[key] = table
+        while len(_gradient_cache) > _GRADIENT_CACHE_SIZE:
+            _gradient_cache.popitem(last=False)
+
+    return table
+
+# color tables keyed by (max_rgb_value, gamma, white_balance, inverse)
+_color_tables_cache = {}
+_reverse_color_tables_cache = {}
+_COLOR_TABLES_CACHE_SIZE = 64
+
+
+def _build_color_table(max_value, gamma, balance, inverse):
+    table = bytearray(256)
+    for value in range(0, 256):
+        scaled = _to_byte(int((float(value) / 255.0) ** gamma * max_value * balance))
+        table[value] = 255 - scaled if inverse else scaled
+
+    if table == _IDENTITY_TABLE:
+        return _IDENTITY_TABLE
+
+    return table
+
+
+def _color_tables(max_rgb_value=255, gamma=1.0, white_balance=(1.0, 1.0, 1.0), inverse=False):
+    """
+    Get the tables mapping 0..255 color values to the values sent to the device.
+
+    @rtype: (bytearray, bytearray, bytearray)
+    @return: 256 byte tables for R, G and B, usable with bytearray.translate
+    """
+    key = (max_rgb_value, gamma, tuple(white_balance), inverse)
+    tables = _color_tables_cache.get(key)
+
+    if tables is None:
+        if len(_color_tables_cache) >= _COLOR_TABLES_CACHE_SIZE:
+            _color_tables_cache.clear()
+
+        by_balance = {}
+        for balance in white_balance:
+            if balance not in by_balance:
+                by_balance[balance] = _build_color_table(max_rgb_value, gamma, balance, inverse)
 
-    if devices:
-        return BlinkStick(device=devices[0])
+        tables = _color_tables_cache[key] = tuple(by_balance[balance] for balance in white_balance)
 
+    return tables
 
-def _remap(value, leftMin, leftMax, rightMin, rightMax):
-    # Figure out how 'wide' each range is
-    leftSpan = leftMax - leftMin
-    rightSpan = rightMax - rightMin
 
-    # Convert the left range into a 0-1 range (float)
-    valueScaled = float(value - leftMin) / float(leftSpan)
+def _reverse_color_tables(max_rgb_value=255, gamma=1.0, white_balance=(1.0, 1.0, 1.0)):
+    # map values read from the device back to the smallest color value producing them
+    key = (max_rgb_value, gamma, tuple(white_balance))
+    tables = _reverse_color_tables_cache.get(key)
 
-    # Convert the 0-1 range into a value in the right range.
-    return int(rightMin + (valueScaled * rightSpan))
+    if tables is None:
+        if len(_reverse_color_tables_cache) >= _COLOR_TABLES_CACHE_SIZE:
+            _reverse_color_tables_cache.clear()
 
-def _remap_color(value, max_value):
-    return _remap(value, 0, 255, 0, max_value)
+        tables = []
+        for table in _color_tables(max_rgb_value, gamma, white_balance):
+            reverse = bytearray(256)
+            value = 0
+            for device_value in range(0, 256):
+                while value < 255 and table[value] < device_value:
+                    value += 1
+                reverse[device_value] = value
+            tables.append(reverse)
 
-def _remap_color_reverse(value, max_value):
-    return _remap(value, 0, max_value, 0, 255)
+        tables = _reverse_color_tables_cache[key] = tuple(tables)
 
-def _remap_rgb_value(rgb_val, max_value):
-    return [_remap_color(rgb_val[0], max_value),
-        _remap_color(rgb_val[1], max_value),
-        _remap_color(rgb_val[2], max_value)]
+    return tables
 
-def _remap_rgb_value_reverse(rgb_val, max_value):
-    return [_remap_color_reverse(rgb_val[0], max_value),
-        _remap_color_reverse(rgb_val[1], max_value),
-        _remap_color_reverse(rgb_val[2], max_value)]
 
 def get_blinkstick_package_version():
     return __version__
@@ -0,0 +1,306 @@
+"""
+BlinkStick daemon and client.
+
+The daemon keeps BlinkStick devices open and accepts commands over a Unix domain
+socket, so sending a command costs one socket round trip instead of a USB bus
+scan and device open. The protocol is one JSON object per line in each direction:
+
+    {"command": "set_color", "serial": null, "args": {"name": "red"}, "max_rgb_value": 255}
+
+is answered with
+
+    {"results": {"BS000001-3.0": null}, "errors": {}}
+
+C{serial} selects a single device, or all devices when it is null. C{inverse}
+and C{max_rgb_value} are optional and applied to the selected devices while
+the command is run.
+"""
+
+import os
+import json
+import socket
+import logging
+import threading
+import time
+
+try:
+    import socketserver
+except ImportError:
+    import SocketServer as socketserver
+
+from . import blinkstick
+from .group import BlinkStickGroup
+
+logger = logging.getLogger(__name__)
+
+# BlinkStick methods which can be called through the daemon
+COMMANDS = ("set_color", "blink", "pulse", "morph", "set_led_data", "turn_off",
+            "get_color", "get_mode", "get_led_count", "get_info_block1", "get_info_block2")
+
+
+def default_socket_path():
+    """
+    Get the path of the daemon socket. It can be set with the BLINKSTICKD_SOCKET
+    environment variable and defaults to blinkstickd.sock in XDG_RUNTIME_DIR.
+
+    @rtype: str
+    @return: path of the Unix domain socket
+    """
+    path = os.environ.get("BLINKSTICKD_SOCKET")
+    if path:
+        return path
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "blinkstickd.sock")
+
+    return "/tmp/blinkstickd-{0}.sock".format(os.getuid())
+
+
+def device_info(stick):
+    """
+    Collect the information displayed by the command line tool for a device.
+
+    @type  stick: BlinkStick
+    @param stick: the device to query
+    @rtype: dict
+    @return: device details, led_count is only present for BlinkStick Flex
+    """
+    info = {
+        "manufacturer": stick.get_manufacturer(),
+        "description": stick.get_description(),
+        "variant": stick.get_variant_string(),
+        "serial": stick.get_serial(),
+        "color": stick.get_color(color_format="hex"),
+        "mode": stick.get_mode(),
+    }
+
+    if stick.get_variant() == blinkstick.BlinkStick.BLINKSTICK_FLEX:
+        try:
+            info["led_count"] = stick.get_led_count()
+        except Exception:
+            info["led_count"] = -1
+
+    info["info_block1"] = stick.get_info_block1()
+    info["info_block2"] = stick.get_info_block2()
+
+    return info
+
+
+class BlinkStickDaemon(object):
+    """
+    BlinkStickDaemon keeps devices open and serves commands on a Unix domain socket.
+    """
+
+    def __init__(self, socket_path=None):
+        """
+        Initialize BlinkStickDaemon class.
+
+        @type  socket_path: str
+        @param socket_path: path of the socket to listen on, L{default_socket_path} if not supplied
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.sticks = {}
+        # minimum time in seconds between scans for devices plugged in or removed
+        # when a request is sent to all devices
+        self.rescan_interval = 1.0
+        self._last_rescan = None
+        self._sticks_lock = threading.Lock()
+        self._device_locks = {}
+        self._server = None
+
+    def _location(self, device):
+        if blinkstick._is_hid_device(device):
+            return device.serial_number
+        return (device.bus, device.address)
+
+    def rescan(self):
+        """
+        Open the devices which have been plugged in since the last scan, and
+        close the devices which have been removed.
+        """
+        with self._sticks_lock:
+            self._last_rescan = time.time()
+            # pyusb returns a generator, which is iterated twice below
+            devices = list(blinkstick._find_blicksticks())
+            present = set(self._location(d) for d in devices)
+
+            known = set()
+            for serial, stick in list(self.sticks.items()):
+                location = self._location(stick.device)
+                if location in present:
+                    known.add(location)
+                else:
+                    logger.info("BlinkStick %s was removed", serial)
+                    del self.sticks[serial]
+
+            for d in devices:
+                if self._location(d) in known:
+                    continue
+
+                try:
+                    stick = blinkstick.BlinkStick(device=d)
+                except Exception as e:
+                    logger.warning("Could not open device: %s", e)
+                    continue
+
+                # report errors the same way as the command line tool does without the daemon
+                stick.set_error_reporting(False)
+
+                logger.info("Opened BlinkStick %s", stick.get_serial())
+                self.sticks[stick.get_serial()] = stick
+                self._device_locks.setdefault(stick.get_serial(), threading.Lock())
+
+    def _select(self, serial):
+        if serial is None:
+            if self._last_rescan is None or time.time() - self._last_rescan >= self.rescan_interval:
+                self.rescan()
+            return list(self.sticks.values())
+
+        if serial not in self.sticks:
+            self.rescan()
+
+        if serial in self.sticks:
+            return [self.sticks[serial]]
+
+        return []
+
+    def _call(self, stick, request):
+        with self._device_locks[stick.get_serial()]:
+            # the settings only apply to this request
+            inverse, max_rgb_value = stick.get_inverse(), stick.max_rgb_value
+
+            try:
+                if "inverse" in request:
+                    stick.set_inverse(bool(request["inverse"]))
+
+                if "max_rgb_value" in request:
+                    stick.set_max_rgb_value(int(request["max_rgb_value"]))
+
+                if request["command"] == "info":
+                    return device_info(stick)
+
+                return getattr(stick, request["command"])(**request.get("args", {}))
+            finally:
+                stick.set_inverse(inverse)
+                stick.set_max_rgb_value(max_rgb_value)
+
+    def handle(self, request):
+        """
+        Run a single request.
+
+        @type  request: dict
+        @param request: decoded request
+        @rtype: dict
+        @return: response to send back to the client
+        """
+        command = request.get("command")
+
+        if command == "ping":
+            return {"results": {}, "errors": {}}
+
+        if command == "rescan":
+            self.rescan()
+            return {"results": dict((serial, None) for serial in self.sticks), "errors": {}}
+
+        if command != "info" and command not in COMMANDS:
+            return {"error": "Unknown command {0}".format(command)}
+
+        sticks = self._select(request.get("serial"))
+        if not sticks and request.get("serial") is not None:
+            return {"error": "BlinkStick with serial number {0} not found".format(request["serial"])}
+
+        with BlinkStickGroup(sticks) as group:
+            result = group.call(self._call, request)
+
+        return {"results": result.results,
+                "errors": dict((serial, str(error)) for serial, error in result.errors.items())}
+
+    def serve_forever(self):
+        """
+        Open all attached devices and serve requests until L{shutdown} is called.
+        """
+        if os.path.exists(self.socket_path):
+            if request({"command": "ping"}, self.socket_path) is not None:
+                raise blinkstick.BlinkStickException("blinkstickd is already running on {0}".format(self.socket_path))
+            os.unlink(self.socket_path)
+
+        self.rescan()
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        response = daemon.handle(json.loads(line.decode("utf-8")))
+                    except Exception as e:
+                        logger.exception("Request failed")
+                        response = {"error": str(e)}
+
+                    self.wfile.write((json.dumps(response) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(self.socket_path, Handler)
+        logger.info("Listening on %s", self.socket_path)
+
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """
+        Stop serving requests.
+        """
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def request(message, socket_path=None, timeout=1.0, response_timeout=10.0):
+    """
+    Send a request to the daemon and wait for the response.
+
+    @type  message: dict
+    @param message: the request
+    @type  socket_path: str
+    @param socket_path: path of the daemon socket, L{default_socket_path} if not supplied
+    @type  timeout: float
+    @param timeout: time in seconds to wait for the connection
+    @type  response_timeout: float
+    @param response_timeout: time in seconds to wait for the response, which has to
+        include the time animations take to complete
+    @rtype: dict
+    @return: the response, or None if the daemon is not running
+    @raise blinkstick.BlinkStickException: the daemon did not respond in time
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path or default_socket_path())
+        except (IOError, OSError):
+            return None
+
+        sock.settimeout(response_timeout)
+        try:
+            sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+            response = sock.makefile("rb").readline()
+        except socket.timeout:
+            raise blinkstick.BlinkStickException("blinkstickd did not respond within {0} seconds".format(response_timeout))
+
+        if not response:
+            return None
+
+        return json.loads(response.decode("utf-8"))
+    finally:
+        sock.close()
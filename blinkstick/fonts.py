@@ -0,0 +1,164 @@
+"""
+Bitmap fonts for L{blinkstick.BlinkStickProMatrix.text}.
+
+Glyphs are stored with one byte per column, the least significant bit being the
+top row. The first time a glyph is drawn it is compiled to the horizontal runs
+of lit pixels, and for every color it is drawn in to the framebuffer bytes of
+those runs, so drawing a glyph only copies a few slices:
+
+    >>> from blinkstick import fonts
+    >>> fonts.FONT_5X7.measure("12:45")
+    (29, 7)
+"""
+
+_PRINTABLE = "".join(chr(c) for c in range(0x20, 0x7f))
+
+# size of the cache of glyphs compiled for a color
+_COLORED_GLYPHS_CACHE_SIZE = 1024
+
+
+class BitmapFont(object):
+    """
+    BitmapFont is a fixed width font with glyphs of up to 8 rows.
+    """
+
+    def __init__(self, name, width, height, chars, data):
+        """
+        Initialize BitmapFont class.
+
+        @type  name: str
+        @param name: name of the font
+        @type  width: int
+        @param width: number of columns of each glyph
+        @type  height: int
+        @param height: number of rows of each glyph
+        @type  chars: str
+        @param chars: characters included in the font, in the order of data
+        @type  data: str
+        @param data: hex encoded columns of all glyphs, width bytes per glyph
+        """
+        self.name = name
+        self.width = width
+        self.height = height
+
+        columns = bytearray.fromhex(data)
+        if len(columns) != len(chars) * width:
+            raise ValueError("Font {0} has {1} columns for {2} characters".format(name, len(columns), len(chars)))
+
+        self.glyphs = dict((char, tuple(columns[i * width:(i + 1) * width])) for i, char in enumerate(chars))
+
+        self._runs = {}
+        self._colored = {}
+
+    def __repr__(self):
+        return "BitmapFont({0!r})".format(self.name)
+
+    def glyph(self, char):
+        """
+        Get the columns of the glyph for char. Characters missing from the font
+        are replaced with their upper case version if the font has it, or a blank.
+
+        @rtype: tuple
+        @return: one byte per column, the least significant bit is the top row
+        """
+        columns = self.glyphs.get(char)
+
+        if columns is None:
+            columns = self.glyphs.get(char.upper(), (0,) * self.width)
+
+        return columns
+
+    def runs(self, char):
+        """
+        Get the horizontal runs of lit pixels of the glyph for char.
+
+        @rtype: list
+        @return: (x, y, length) tuples relative to the top left corner of the glyph
+        """
+        runs = self._runs.get(char)
+
+        if runs is None:
+            columns = self.glyph(char)
+            runs = []
+
+            for y in range(0, self.height):
+                x = 0
+                while x < self.width:
+                    if columns[x] >> y & 1:
+                        start = x
+                        while x < self.width and columns[x] >> y & 1:
+                            x += 1
+                        runs.append((start, y, x - start))
+                    else:
+                        x += 1
+
+            self._runs[char] = runs
+
+        return runs
+
+    def colored_runs(self, char, r, g, b):
+        """
+        Get the runs of the glyph for char together with their pixels in GRB order,
+        ready to be copied to the framebuffer of L{blinkstick.BlinkStickProMatrix}.
+
+        @rtype: list
+        @return: (x, y, pixels) tuples relative to the top left corner of the glyph
+        """
+        key = (char, r, g, b)
+        runs = self._colored.get(key)
+
+        if runs is None:
+            if len(self._colored) >= _COLORED_GLYPHS_CACHE_SIZE:
+                self._colored.clear()
+
+            pixel = bytearray([g, r, b])
+            runs = self._colored[key] = [(x, y, bytes(pixel * length)) for x, y, length in self.runs(char)]
+
+        return runs
+
+    def measure(self, string, spacing=1):
+        """
+        Get the size of the string rendered with this font.
+
+        @type  string: str
+        @param string: the text, lines are separated with newlines
+        @type  spacing: int
+        @param spacing: number of blank columns between characters
+        @rtype: (int, int)
+        @return: width and height in pixels
+        """
+        lines = string.split("\n")
+        width = max(len(line) for line in lines) * (self.width + spacing) - spacing
+
+        return max(0, width), len(lines) * (self.height + 1) - 1
+
+
+FONT_3X5 = BitmapFont(
+    "3x5", 3, 5,
+    _PRINTABLE.replace("abcdefghijklmnopqrstuvwxyz", ""),
+    "0000000017000300031f0a1f121f091904130a151a000300000e11110e000a040a040e04"
+    "1008000404040010001804031f111f121f101d151715151f07041f17151d1f151d011d03"
+    "1f151f17151f000a00100a00040a110a0a0a110a040115020e15161e051e1f150a0e1111"
+    "1f110e1f15111f05010e111d1f041f111f1108100f1f041b1f10101f061f1f011e0e110e"
+    "1f05020e19161f051a121509011f011f101f0f100f1f0c1f1b041b031c031915131f1100"
+    "03041800111f020102101010010200041f11001f00111f04040602")
+
+FONT_5X7 = BitmapFont(
+    "5x7", 5, 7,
+    _PRINTABLE,
+    "000000000000005f00000007000700147f147f14242a7f2a1223130864623649552250"
+    "0005030000001c2241000041221c00082a1c2a0808083e080800503000000808080808"
+    "006060000020100804023e5149453e00427f400042615149462141454b311814127f10"
+    "27454545393c4a49493001710905033649494936064949291e00363600000056360000"
+    "0814224100141414141400412214080201510906324979413e7e1111117e7f49494936"
+    "3e414141227f4141221c7f494949417f090901013e414151327f0808087f00417f4100"
+    "2040413f017f081422417f404040407f0204027f7f0408107f3e4141413e7f09090906"
+    "3e4151215e7f09192946464949493101017f01013f4040403f1f2040201f7f2018207f"
+    "631408146303047804036151494543007f41410002040810200041417f000402010204"
+    "4040404040000102040020545454787f484444383844444420384444487f3854545418"
+    "087e0901020c5252523e7f0804047800447d40002040443d007f1028440000417f4000"
+    "7c041804787c0804047838444444387c14141408081414187c7c080404084854545420"
+    "043f4440203c4040207c1c2040201c3c4030403c44281028440c5050503c4464544c44"
+    "000836410000007f000000413608000804081008")
+
+DEFAULT_FONT = FONT_5X7
@@ -0,0 +1,175 @@
+"""
+Control several BlinkStick devices at once.
+
+Operations on a L{BlinkStickGroup} are issued to all member devices concurrently
+on a bounded thread pool, so applying a color or an animation to many devices
+takes about as long as applying it to one:
+
+    >>> from blinkstick import group
+    >>> with group.find_all() as sticks:
+    ...     result = sticks.pulse(name="red", repeats=3)
+    ...     result.errors
+    {}
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from . import blinkstick
+
+
+class GroupResult(object):
+    """
+    Results of an operation issued to all devices of a group, keyed by device serial.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self):
+        """
+        @rtype: bool
+        @return: True if the operation succeeded on all devices
+        """
+        return not self.errors
+
+    def __repr__(self):
+        return "GroupResult(results={0!r}, errors={1!r})".format(self.results, self.errors)
+
+
+class BlinkStickGroup(object):
+    """
+    BlinkStickGroup wraps a list of L{blinkstick.BlinkStick} objects and issues
+    operations to all of them concurrently.
+    """
+
+    def __init__(self, sticks, max_workers=8):
+        """
+        Initialize BlinkStickGroup class.
+
+        @type  sticks: BlinkStick[]
+        @param sticks: devices in the group
+        @type  max_workers: int
+        @param max_workers: maximum number of devices communicated with at the same time
+        """
+        self.sticks = list(sticks)
+        self.max_workers = max_workers
+        self._executor = None
+
+    def __len__(self):
+        return len(self.sticks)
+
+    def __iter__(self):
+        return iter(self.sticks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Shut down the thread pool used by the group.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def call(self, method, *args, **kwargs):
+        """
+        Call a method of L{blinkstick.BlinkStick} on all devices concurrently.
+
+        @type  method: str or callable
+        @param method: name of the method to call, e.g. "set_color", or a function
+            which is called with the device as the first argument
+        @rtype: GroupResult
+        @return: return value or raised exception for each device
+        """
+        if self._executor is None and self.sticks:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(self.sticks))))
+
+        if callable(method):
+            futures = [(stick, self._executor.submit(method, stick, *args, **kwargs))
+                       for stick in self.sticks]
+        else:
+            futures = [(stick, self._executor.submit(getattr(stick, method), *args, **kwargs))
+                       for stick in self.sticks]
+
+        result = GroupResult()
+        for stick, future in futures:
+            error = future.exception()
+            if error is None:
+                result.results[stick.get_serial()] = future.result()
+            else:
+                result.errors[stick.get_serial()] = error
+
+        return result
+
+    def set_color(self, **kwargs):
+        """
+        Set the color of all devices. See L{blinkstick.BlinkStick.set_color}.
+        """
+        return self.call("set_color", **kwargs)
+
+    def set_led_data(self, channel, data):
+        """
+        Send the same LED data frame to all devices. See L{blinkstick.BlinkStick.set_led_data}.
+        """
+        return self.call("set_led_data", channel, data)
+
+    def turn_off(self):
+        """
+        Turn off all devices.
+        """
+        return self.call("turn_off")
+
+    def morph(self, **kwargs):
+        """
+        Morph all devices to the specified color. See L{blinkstick.BlinkStick.morph}.
+        """
+        return self.call("morph", **kwargs)
+
+    def pulse(self, **kwargs):
+        """
+        Pulse the specified color on all devices. See L{blinkstick.BlinkStick.pulse}.
+        """
+        return self.call("pulse", **kwargs)
+
+    def blink(self, **kwargs):
+        """
+        Blink the specified color on all devices. See L{blinkstick.BlinkStick.blink}.
+        """
+        return self.call("blink", **kwargs)
+
+    def get_color(self, index=0, color_format='rgb'):
+        return self.call("get_color", index=index, color_format=color_format)
+
+    def get_mode(self):
+        return self.call("get_mode")
+
+    def get_led_count(self):
+        return self.call("get_led_count")
+
+    def get_manufacturer(self):
+        return self.call("get_manufacturer")
+
+    def get_description(self):
+        return self.call("get_description")
+
+    def get_info_block1(self):
+        return self.call("get_info_block1")
+
+    def get_info_block2(self):
+        return self.call("get_info_block2")
+
+
+def find_all(max_workers=8):
+    """
+    Find all attached BlinkStick devices.
+
+    @rtype: BlinkStickGroup
+    @return: a group of all attached devices
+    """
+    return BlinkStickGroup(blinkstick.find_all(), max_workers=max_workers)
@@ -0,0 +1,302 @@
+"""
+Show images and animations on BlinkStick devices.
+
+Images are decoded, resampled to the size of the device, and converted to the
+data sent to the device once, when they are loaded. Playing them back only
+sends the prepared data:
+
+    >>> from blinkstick import blinkstick, images
+    >>> matrix = blinkstick.BlinkStickProMatrix(r_columns=8, r_rows=8)
+    >>> matrix.connect()
+    >>> animation = images.load("spinner.gif", matrix, brightness=0.5)
+    >>> images.play(animation, matrix, repeats=3)
+
+PPM images are supported natively, PNG, GIF and other formats require Pillow.
+Loaded images are kept in a cache keyed by the file, the size and layout of the
+device, its color settings and the brightness, so loading the same image again
+costs only a lookup.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+from . import blinkstick
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# maximum number of loaded images kept in the cache
+CACHE_SIZE = 16
+
+# duration of frames of images which do not specify it
+DEFAULT_DURATION = 100
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ImageAnimation(object):
+    """
+    ImageAnimation holds the frames of an image converted to the data sent to the
+    device. Still images have a single frame.
+    """
+
+    def __init__(self, frames, durations):
+        """
+        Initialize ImageAnimation class.
+
+        @type  frames: list
+        @param frames: data to send to R, G and B channels for each frame, None for unused channels
+        @type  durations: list
+        @param durations: duration of each frame in milliseconds
+        """
+        self.frames = frames
+        self.durations = durations
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __repr__(self):
+        return "ImageAnimation(frames={0}, duration={1}ms)".format(len(self.frames), sum(self.durations))
+
+
+def _read_ppm(f):
+    data = f.read()
+
+    # header is magic number, width, height and maximum value separated by whitespace and comments
+    fields = []
+    pos = 0
+    while len(fields) < 4:
+        while pos < len(data) and data[pos:pos + 1].isspace():
+            pos += 1
+        if data[pos:pos + 1] == b"#":
+            while pos < len(data) and data[pos:pos + 1] not in (b"\n", b"\r"):
+                pos += 1
+            continue
+        start = pos
+        while pos < len(data) and not data[pos:pos + 1].isspace() and data[pos:pos + 1] != b"#":
+            pos += 1
+        if start == pos:
+            raise blinkstick.BlinkStickException("Truncated PPM header")
+        fields.append(data[start:pos])
+
+    magic = fields[0]
+    if magic not in (b"P3", b"P6"):
+        raise blinkstick.BlinkStickException("Unsupported PPM format {0}".format(magic.decode("ascii", "replace")))
+
+    width, height, max_value = int(fields[1]), int(fields[2]), int(fields[3])
+    count = width * height * 3
+
+    if magic == b"P3":
+        values = [int(value) for value in data[pos:].split()[:count]]
+    elif max_value < 256:
+        # a single whitespace character separates the header from the pixels
+        values = bytearray(data[pos + 1:pos + 1 + count])
+    else:
+        raw = bytearray(data[pos + 1:pos + 1 + count * 2])
+        values = [raw[i] << 8 | raw[i + 1] for i in range(0, len(raw), 2)]
+
+    if len(values) < count:
+        raise blinkstick.BlinkStickException("Truncated PPM image")
+
+    if max_value != 255:
+        values = [value * 255 // max_value for value in values]
+
+    return width, height, bytearray(values)
+
+
+def _resample(pixels, width, height, columns, rows):
+    # nearest neighbour resampling of packed RGB data
+    if (width, height) == (columns, rows):
+        return pixels
+
+    resampled = bytearray(columns * rows * 3)
+    offsets = [(x * width // columns) * 3 for x in range(0, columns)]
+    i = 0
+    for y in range(0, rows):
+        row = (y * height // rows) * width * 3
+        for offset in offsets:
+            resampled[i:i + 3] = pixels[row + offset:row + offset + 3]
+            i += 3
+
+    return resampled
+
+
+def decode(source, columns, rows):
+    """
+    Decode all frames of an image and resample them.
+
+    @type  source: str or file
+    @param source: path of the image or a file opened in binary mode
+    @type  columns: int
+    @param columns: width to resample the image to
+    @type  rows: int
+    @param rows: height to resample the image to
+    @rtype: list
+    @return: (pixels, duration) tuple for each frame, with packed RGB pixels and
+        the duration in milliseconds
+    """
+    f = open(source, "rb") if isinstance(source, str) else source
+    try:
+        header = f.read(2)
+        f.seek(-len(header), os.SEEK_CUR)
+
+        if header in (b"P3", b"P6"):
+            width, height, pixels = _read_ppm(f)
+            return [(_resample(pixels, width, height, columns, rows), DEFAULT_DURATION)]
+
+        if Image is None:
+            raise blinkstick.BlinkStickException("Pillow is required to load images other than PPM")
+
+        image = Image.open(f)
+        frames = []
+        for index in range(0, getattr(image, "n_frames", 1)):
+            image.seek(index)
+            frame = image.convert("RGB").resize((columns, rows))
+            frames.append((bytearray(frame.tobytes()), image.info.get("duration") or DEFAULT_DURATION))
+
+        return frames
+    finally:
+        if f is not source:
+            f.close()
+
+
+def _target_key(target):
+    if isinstance(target, blinkstick.BlinkStickProMatrix):
+        return ("matrix", target.r_columns, target.r_rows, target.g_columns, target.g_rows,
+                target.b_columns, target.b_rows, tuple(layout._key() for layout in target.layouts),
+                target.max_rgb_value, target.gamma, tuple(target.white_balance))
+
+    return ("strip", target.max_rgb_value, target.gamma, tuple(target.white_balance), target.inverse)
+
+
+def _convert_for_matrix(frames, matrix):
+    # render each frame with the matrix itself, so the layout and the color
+    # tables are applied exactly as when sending, then restore its state
+    saved_data = bytes(matrix.matrix_data)
+    saved_dirty = list(matrix._dirty)
+    saved_scroll = (matrix.scroll_x, matrix.scroll_y)
+
+    try:
+        matrix.scroll_x = matrix.scroll_y = 0
+
+        converted = []
+        for pixels in frames:
+            matrix.blit(0, 0, pixels, width=matrix.cols)
+            converted.append(matrix._wire_frame())
+
+        return converted
+    finally:
+        matrix.matrix_data[:] = saved_data
+        matrix._dirty[:] = saved_dirty
+        matrix.scroll_x, matrix.scroll_y = saved_scroll
+
+
+def _convert_for_strip(frames, stick):
+    tables = blinkstick._color_tables(stick.max_rgb_value, stick.gamma, stick.white_balance, stick.inverse)
+
+    converted = []
+    for pixels in frames:
+        wire = bytearray(len(pixels))
+        # pixels are in RGB order and the device expects GRB
+        wire[0::3] = pixels[1::3].translate(tables[1])
+        wire[1::3] = pixels[0::3].translate(tables[0])
+        wire[2::3] = pixels[2::3].translate(tables[2])
+        converted.append((bytes(wire), None, None))
+
+    return converted
+
+
+def load(source, target, brightness=1.0, led_count=None):
+    """
+    Load an image or animation and prepare it for the device.
+
+    @type  source: str or file
+    @param source: path of the image or a file opened in binary mode. Only images
+        loaded from a path are cached.
+    @type  target: BlinkStickProMatrix or BlinkStick
+    @param target: the device the image is shown on. The image is resampled to the
+        size of the matrix, or to a single row of led_count LEDs for BlinkStick.
+    @type  brightness: float
+    @param brightness: 0..1 multiplier applied to the image
+    @type  led_count: int
+    @param led_count: number of LEDs of a BlinkStick, based on the variant of the device if not supplied
+    @rtype: ImageAnimation
+    @return: the prepared frames
+    """
+    if isinstance(target, blinkstick.BlinkStickProMatrix):
+        columns, rows = target.cols, target.rows
+    elif isinstance(target, blinkstick.BlinkStick):
+        columns, rows = led_count or target._get_default_led_count(), 1
+    else:
+        raise blinkstick.BlinkStickException("Images can be shown on BlinkStickProMatrix and BlinkStick only")
+
+    key = None
+    if isinstance(source, str):
+        path = os.path.abspath(source)
+        key = (path, os.path.getmtime(path), columns, rows, _target_key(target), brightness)
+
+        with _cache_lock:
+            animation = _cache.get(key)
+            if animation is not None:
+                # most recently used images are at the end
+                del _cache[key]
+                _cache[key] = animation
+                return animation
+
+    frames = decode(source, columns, rows)
+    durations = [duration for pixels, duration in frames]
+    frames = [pixels for pixels, duration in frames]
+
+    if brightness != 1.0:
+        table = bytearray([min(255, int(value * brightness)) for value in range(0, 256)])
+        frames = [pixels.translate(table) for pixels in frames]
+
+    if isinstance(target, blinkstick.BlinkStickProMatrix):
+        animation = ImageAnimation(_convert_for_matrix(frames, target), durations)
+    else:
+        animation = ImageAnimation(_convert_for_strip(frames, target), durations)
+
+    if key is not None:
+        with _cache_lock:
+            _cache[key] = animation
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+
+    return animation
+
+
+def clear_cache():
+    """
+    Remove all loaded images from the cache.
+    """
+    with _cache_lock:
+        _cache.clear()
+
+
+def play(animation, target, repeats=1):
+    """
+    Show the frames of an animation loaded with L{load}.
+
+    @type  animation: ImageAnimation
+    @param animation: the frames to show
+    @type  target: BlinkStickProMatrix or BlinkStick
+    @param target: the device the animation was loaded for
+    @type  repeats: int
+    @param repeats: number of times to play the animation
+    """
+    deadline = blinkstick._monotonic()
+
+    for x in range(repeats):
+        for frame, duration in zip(animation.frames, animation.durations):
+            if isinstance(target, blinkstick.BlinkStickPro):
+                # frames are timed by their durations, not by target_fps
+                target.send_wire_frame(frame, paced=False)
+            else:
+                target.set_led_data(0, frame[0])
+
+            deadline += duration / 1000.0
+            blinkstick._sleep_until(deadline)
@@ -0,0 +1,381 @@
+"""
+Drawing primitives for L{blinkstick.BlinkStickProMatrix}.
+
+The functions in this module compute which pixels a shape covers as horizontal
+spans, (y, x1, x2) tuples with both ends included, sorted by row and column and
+without overlaps. The matrix writes each span to its framebuffer with a single
+slice assignment, so the cost of drawing depends on the number of rows rather
+than the number of pixels.
+"""
+
+import math
+
+from . import blinkstick
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def line_points(x1, y1, x2, y2):
+    """
+    Get the points of a line from x1:y1 to x2:y2 (Bresenham's algorithm).
+
+    @rtype: list
+    @return: (x, y) tuples in order from x1:y1 to x2:y2
+    """
+    points = []
+    is_steep = abs(y2 - y1) > abs(x2 - x1)
+    if is_steep:
+        x1, y1 = y1, x1
+        x2, y2 = y2, x2
+    rev = False
+    if x1 > x2:
+        x1, x2 = x2, x1
+        y1, y2 = y2, y1
+        rev = True
+    delta_x = x2 - x1
+    delta_y = abs(y2 - y1)
+    error = int(delta_x / 2)
+    y = y1
+
+    if y1 < y2:
+        y_step = 1
+    else:
+        y_step = -1
+    for x in range(x1, x2 + 1):
+        if is_steep:
+            points.append((y, x))
+        else:
+            points.append((x, y))
+        error -= delta_y
+        if error < 0:
+            y += y_step
+            error += delta_x
+    # Reverse the list if the coordinates were reversed
+    if rev:
+        points.reverse()
+    return points
+
+
+def points_to_spans(points):
+    """
+    Merge points into spans.
+
+    @type  points: list
+    @param points: (x, y) tuples, duplicates are allowed
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    spans = []
+
+    for x, y in sorted(set((y, x) for x, y in points)):
+        # sorted by row, x and y are swapped
+        if spans and spans[-1][0] == x and spans[-1][2] == y - 1:
+            spans[-1] = (x, spans[-1][1], y)
+        else:
+            spans.append((x, y, y))
+
+    return spans
+
+
+def line_spans(x1, y1, x2, y2):
+    """
+    Get the spans of a line from x1:y1 to x2:y2.
+
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    return points_to_spans(line_points(x1, y1, x2, y2))
+
+
+def polyline_spans(points, closed=False):
+    """
+    Get the spans of lines connecting the points. Pixels shared by consecutive
+    lines are only included once.
+
+    @type  points: list
+    @param points: (x, y) tuples
+    @type  closed: bool
+    @param closed: also connect the last point to the first one
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    points = list(points)
+    if closed and len(points) > 2:
+        points.append(points[0])
+
+    covered = list(points[:1])
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        covered.extend(line_points(x1, y1, x2, y2))
+
+    return points_to_spans(covered)
+
+
+def rectangle_spans(x1, y1, x2, y2, fill=False):
+    """
+    Get the spans of a rectangle with it's corners at x1:y1 and x2:y2.
+
+    @type  fill: bool
+    @param fill: True for a filled rectangle, False for the outline
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    x1, x2 = min(x1, x2), max(x1, x2)
+    y1, y2 = min(y1, y2), max(y1, y2)
+
+    spans = []
+    for y in range(y1, y2 + 1):
+        if fill or y == y1 or y == y2 or x2 - x1 < 2:
+            spans.append((y, x1, x2))
+        else:
+            spans.append((y, x1, x1))
+            spans.append((y, x2, x2))
+
+    return spans
+
+
+def _ellipse_half_widths(rx, ry):
+    # widest x offset inside the ellipse for each row offset -ry..ry, the
+    # rx * ry term rounds the edge to the nearest pixel instead of truncating it
+    if ry == 0:
+        return [rx]
+
+    limit = rx * rx * ry * ry + rx * ry
+    widths = []
+    for dy in range(-ry, ry + 1):
+        remaining = limit - dy * dy * rx * rx
+        w = int(math.sqrt(float(remaining) / (ry * ry))) if remaining > 0 else 0
+        while w > 0 and w * w * ry * ry > remaining:
+            w -= 1
+        while (w + 1) * (w + 1) * ry * ry <= remaining:
+            w += 1
+        widths.append(w)
+
+    return widths
+
+
+def ellipse_spans(cx, cy, rx, ry, fill=False):
+    """
+    Get the spans of an ellipse centered at cx:cy.
+
+    @type  rx: int
+    @param rx: horizontal radius
+    @type  ry: int
+    @param ry: vertical radius
+    @type  fill: bool
+    @param fill: True for a filled ellipse, False for the outline
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    rx, ry = abs(rx), abs(ry)
+    widths = _ellipse_half_widths(rx, ry)
+
+    spans = []
+    for i, w in enumerate(widths):
+        y = cy - ry + i
+
+        if fill:
+            spans.append((y, cx - w, cx + w))
+            continue
+
+        # a pixel is on the outline if the rows above or below do not reach it
+        above = widths[i - 1] if i > 0 else -1
+        below = widths[i + 1] if i + 1 < len(widths) else -1
+        inner = min(above, below, w - 1)
+
+        if inner < 0:
+            spans.append((y, cx - w, cx + w))
+        else:
+            spans.append((y, cx - w, cx - inner - 1))
+            spans.append((y, cx + inner + 1, cx + w))
+
+    return spans
+
+
+def circle_spans(cx, cy, radius, fill=False):
+    """
+    Get the spans of a circle centered at cx:cy.
+
+    @rtype: list
+    @return: (y, x1, x2) spans
+    """
+    return ellipse_spans(cx, cy, radius, radius, fill)
+
+
+def flood_spans(data, columns, rows, x, y):
+    """
+    Get the spans of the area around x:y which has the same color as x:y.
+
+    @type  data: bytearray
+    @param data: framebuffer with 3 bytes per pixel, row by row
+    @type  columns: int
+    @param columns: number of columns of the framebuffer
+    @type  rows: int
+    @param rows: number of rows of the framebuffer
+    @rtype: list
+    @return: (y, x1, x2) spans, empty if x:y is outside of the framebuffer
+    """
+    if x < 0 or x >= columns or y < 0 or y >= rows:
+        return []
+
+    def color(px, py):
+        i = (py * columns + px) * 3
+        return data[i:i + 3]
+
+    target = color(x, y)
+    filled = bytearray(columns * rows)
+    spans = []
+    seeds = [(x, y)]
+
+    while seeds:
+        x, y = seeds.pop()
+        if filled[y * columns + x]:
+            continue
+
+        left = x
+        while left > 0 and not filled[y * columns + left - 1] and color(left - 1, y) == target:
+            left -= 1
+        right = x
+        while right < columns - 1 and not filled[y * columns + right + 1] and color(right + 1, y) == target:
+            right += 1
+
+        filled[y * columns + left:y * columns + right + 1] = b"\x01" * (right - left + 1)
+        spans.append((y, left, right))
+
+        # start a new seed at the beginning of each matching run in the neighbour rows
+        for ny in (y - 1, y + 1):
+            if ny < 0 or ny >= rows:
+                continue
+
+            in_run = False
+            for nx in range(left, right + 1):
+                matches = not filled[ny * columns + nx] and color(nx, ny) == target
+                if matches and not in_run:
+                    seeds.append((nx, ny))
+                in_run = matches
+
+    return sorted(spans)
+
+
+def mask_runs(mask, width=None):
+    """
+    Get the horizontal runs of set pixels of a mask.
+
+    @type  mask: bytes, bytearray, numpy.ndarray or list
+    @param mask: one value per pixel, row by row, or a (rows, cols) array or nested
+        lists; non-zero values are set
+    @type  width: int
+    @param width: width of the mask in pixels, required for flat masks
+    @rtype: list
+    @return: (x, y, length) tuples
+    """
+    if width is None:
+        rows = [list(row) for row in mask]
+    else:
+        mask = list(mask)
+        rows = [mask[i:i + width] for i in range(0, len(mask), width)] if width > 0 else []
+
+    runs = []
+    for y, row in enumerate(rows):
+        x = 0
+        while x < len(row):
+            if row[x]:
+                start = x
+                while x < len(row) and row[x]:
+                    x += 1
+                runs.append((start, y, x - start))
+            else:
+                x += 1
+
+    return runs
+
+
+def packed_pixels(image, width=None):
+    """
+    Convert an image to packed color data.
+
+    @type  image: bytes, bytearray, memoryview, array('B'), numpy.ndarray or list
+    @param image: packed color data with 3 bytes per pixel and rows of width pixels,
+        or a (rows, cols, 3) array or nested lists of color values
+    @type  width: int
+    @param width: width of the image in pixels, required for packed color data
+    @rtype: (bytes-like, int)
+    @return: packed color data in the channel order of image and the width of the image
+    """
+    if width is not None:
+        return image, width
+
+    if numpy is not None and isinstance(image, numpy.ndarray):
+        return image.astype(numpy.uint8).tobytes(), image.shape[1]
+
+    width = len(image[0]) if len(image) else 0
+    return bytearray([int(value) for row in image for pixel in row for value in pixel]), width
+
+
+def grb_pixels(image, width=None, format='rgb'):
+    """
+    Convert an image to packed color data in the GRB order of the framebuffer.
+
+    @type  image: bytes, bytearray, memoryview, array('B'), numpy.ndarray or list
+    @param image: packed color data with 3 bytes per pixel and rows of width pixels,
+        or a (rows, cols, 3) array or nested lists of color values
+    @type  width: int
+    @param width: width of the image in pixels, required for packed color data
+    @type  format: str
+    @param format: "rgb" or "grb", the order of the color values in image
+    @rtype: (bytes-like, int)
+    @return: packed color data in GRB order and the width of the image
+    @raise blinkstick.BlinkStickException: the format is not supported
+    """
+    if format not in ('rgb', 'grb'):
+        raise blinkstick.BlinkStickException("Unsupported pixel format %s" % format)
+
+    pixels, width = packed_pixels(image, width)
+
+    if format == 'rgb':
+        pixels = blinkstick._swap_red_green(pixels)
+
+    return pixels, width
+
+
+class Sprite(object):
+    """
+    Sprite is an image compiled to the runs of pixels drawn by
+    L{blinkstick.BlinkStickProMatrix.draw_sprite}. Pixels outside of the mask are
+    transparent and leave the framebuffer unchanged.
+    """
+
+    def __init__(self, image, mask=None, width=None, format='rgb'):
+        """
+        Initialize Sprite class.
+
+        @type  image: bytes, bytearray, memoryview, array('B'), numpy.ndarray or list
+        @param image: packed color data with 3 bytes per pixel and rows of width pixels,
+            or a (rows, cols, 3) array or nested lists of color values
+        @type  mask: bytes, bytearray, numpy.ndarray or list
+        @param mask: one value per pixel, non-zero values are drawn. All pixels are
+            drawn if not supplied.
+        @type  width: int
+        @param width: width of the image in pixels, required for packed color data
+        @type  format: str
+        @param format: "rgb" or "grb", the order of the color values in image
+        """
+        pixels, self.width = grb_pixels(image, width, format)
+        pixels = bytearray(pixels)
+
+        self.height = len(pixels) // (self.width * 3) if self.width > 0 else 0
+
+        if mask is None:
+            runs = [(0, y, self.width) for y in range(0, self.height)] if self.width > 0 else []
+        elif len(mask) and hasattr(mask[0], "__len__"):
+            runs = mask_runs(mask)
+        else:
+            runs = mask_runs(mask, self.width)
+
+        self.runs = []
+        for x, y, length in runs:
+            if y < self.height:
+                start = (y * self.width + x) * 3
+                self.runs.append((x, y, bytes(pixels[start:start + min(length, self.width - x) * 3])))
@@ -0,0 +1,268 @@
+"""
+Record frames sent to BlinkStick Pro and play them back from a file.
+
+A recording starts with a header describing the device, followed by one fixed
+size record per frame holding the data sent to each channel in use, ready to be
+passed to L{blinkstick.BlinkStick.set_led_data}:
+
+    magic     4 bytes  "BSAN"
+    version   uint8    1
+    variant   uint8    BlinkStick variant the recording was made for
+    reserved  uint16
+    leds      3 x uint16  number of LEDs on R, G and B channels
+    fps       float32  frame rate of the recording
+    frames    uint32   number of frames, 0 if the recording was not closed
+
+All values are little endian. The player maps the file into memory and sends
+the frames straight from the mapping, so playing a recording takes the same
+memory and almost no processing regardless of its length:
+
+    >>> from blinkstick import blinkstick, recording
+    >>> pro = blinkstick.BlinkStickPro(r_led_count=32)
+    >>> pro.connect()
+    >>> with recording.Recorder("show.bsa", pro, fps=30):
+    ...     render_show(pro)
+    >>> with recording.Player("show.bsa") as player:
+    ...     player.play(pro.bstick)
+"""
+
+import mmap
+import os
+import struct
+
+from . import blinkstick
+
+MAGIC = b"BSAN"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sBBH3HfI")
+HEADER_SIZE = _HEADER.size
+
+
+class Recorder(object):
+    """
+    Recorder writes the frames sent by L{blinkstick.BlinkStickPro} to a file.
+    """
+
+    def __init__(self, path, pro, fps=None):
+        """
+        Initialize Recorder class and start recording. Every frame sent with
+        L{blinkstick.BlinkStickPro.send_data_all}, L{blinkstick.BlinkStickPro.present}
+        or L{blinkstick.BlinkStickPro.send_wire_frame} is recorded until L{close}
+        is called. Frames can also be rendered without a device and recorded with
+        L{capture}.
+
+        @type  path: str
+        @param path: file to write the recording to
+        @type  pro: BlinkStickPro
+        @param pro: the frame buffer to record
+        @type  fps: float
+        @param fps: frame rate of the recording, L{blinkstick.BlinkStickPro.target_fps}
+            or 30 if not supplied
+        """
+        self.pro = pro
+        self.led_counts = (pro.r_led_count, pro.g_led_count, pro.b_led_count)
+        self.fps = fps or pro.target_fps or 30
+        self.frame_count = 0
+
+        self.variant = blinkstick.BlinkStick.BLINKSTICK_PRO
+        if pro.bstick is not None:
+            self.variant = pro.bstick.get_variant()
+
+        # the last data recorded for each channel, repeated for channels
+        # which were not sent in a frame
+        self._last = [bytearray(count * 3) for count in self.led_counts]
+
+        self._file = open(path, "wb")
+        self._write_header()
+
+        pro.recorder = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_header(self):
+        self._file.write(_HEADER.pack(MAGIC, VERSION, self.variant, 0,
+                                      self.led_counts[0], self.led_counts[1], self.led_counts[2],
+                                      self.fps, self.frame_count))
+
+    def write_frame(self, frame):
+        """
+        Append a frame to the recording.
+
+        @type  frame: tuple
+        @param frame: data sent to R, G and B channels, None for channels which
+            did not change since the previous frame
+        """
+        for channel, count in enumerate(self.led_counts):
+            if count == 0:
+                continue
+
+            data = frame[channel]
+            if data is not None:
+                last = self._last[channel]
+                length = min(len(data), len(last))
+                last[:length] = data[:length]
+
+            self._file.write(self._last[channel])
+
+        self.frame_count += 1
+
+    def capture(self):
+        """
+        Record the current frame buffer without sending it to the device.
+        """
+        self.write_frame(self.pro._wire_frame())
+
+    def close(self):
+        """
+        Stop recording and complete the file.
+        """
+        if self._file is None:
+            return
+
+        if self.pro.recorder is self:
+            self.pro.recorder = None
+
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+        self._file = None
+
+
+class Player(object):
+    """
+    Player sends the frames of a recording made with L{Recorder} to a device.
+    """
+
+    def __init__(self, path):
+        """
+        Initialize Player class.
+
+        @type  path: str
+        @param path: the recording to play
+        """
+        self._file = open(path, "rb")
+        try:
+            # an empty file cannot be mapped, so check the size first
+            if os.fstat(self._file.fileno()).st_size < HEADER_SIZE:
+                raise blinkstick.BlinkStickException("{0} is not a BlinkStick recording".format(path))
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+
+        magic, version, self.variant, reserved, r_leds, g_leds, b_leds, self.fps, frames = \
+            _HEADER.unpack_from(self._map, 0)
+
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise blinkstick.BlinkStickException("{0} is not a BlinkStick recording".format(path))
+
+        self.led_counts = (r_leds, g_leds, b_leds)
+        self.frame_size = sum(count * 3 for count in self.led_counts)
+
+        # frames written before an interrupted recording are still playable
+        available = (len(self._map) - HEADER_SIZE) // self.frame_size if self.frame_size else 0
+        self.frame_count = min(frames, available) if frames else available
+
+        self._view = memoryview(self._map)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.frame_count
+
+    def close(self):
+        """
+        Release the recording.
+        """
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                # frames returned by frame() are still in use, the mapping is
+                # unmapped when the last of them is released
+                pass
+            self._map = None
+        self._file.close()
+
+    def frame(self, index):
+        """
+        Get the data of a frame.
+
+        @type  index: int
+        @param index: 0 based frame number
+        @rtype: tuple
+        @return: data to send to R, G and B channels, None for unused channels. The
+            data refers to the mapped file and keeps it mapped until it is released.
+        """
+        if index < 0 or index >= self.frame_count:
+            raise IndexError("Frame {0} is out of range".format(index))
+
+        offset = HEADER_SIZE + index * self.frame_size
+        frame = []
+        for count in self.led_counts:
+            if count:
+                frame.append(self._view[offset:offset + count * 3])
+                offset += count * 3
+            else:
+                frame.append(None)
+
+        return tuple(frame)
+
+    def play(self, stick, repeats=1, fps=None):
+        """
+        Send the frames to the device. Frames are sent at absolute deadlines, and
+        when sending falls behind, the frames which missed their deadlines are
+        skipped so the show stays in time.
+
+        @type  stick: BlinkStick or BlinkStickPro
+        @param stick: the device to send the frames to
+        @type  repeats: int
+        @param repeats: number of times to play the recording
+        @type  fps: float
+        @param fps: frame rate to play at, the rate of the recording if not supplied
+        @rtype: int
+        @return: number of frames skipped
+        """
+        if isinstance(stick, blinkstick.BlinkStickPro):
+            stick = stick.bstick
+
+        if self.frame_count == 0:
+            return 0
+
+        period = 1.0 / (fps or self.fps)
+        total = self.frame_count * repeats
+        start = blinkstick._monotonic()
+        skipped = 0
+        index = 0
+
+        while index < total:
+            for channel, data in enumerate(self.frame(index % self.frame_count)):
+                if data is not None:
+                    stick.set_led_data(channel, data)
+
+            index += 1
+            deadline = start + index * period
+            now = blinkstick._monotonic()
+
+            if now < deadline:
+                blinkstick._sleep_until(deadline)
+            else:
+                # continue with the frame which should be shown now
+                behind = min(int((now - deadline) / period), total - index)
+                skipped += behind
+                index += behind
+
+        return skipped
@@ -0,0 +1,236 @@
+"""
+In-process virtual BlinkStick devices.
+
+Virtual devices emulate the descriptors and feature reports of a real BlinkStick
+together with a configurable transfer timing model. Once installed with L{enable},
+L{blinkstick.find_all}, L{blinkstick.find_first} and L{blinkstick.find_by_serial}
+return virtual devices instead of enumerating the USB bus, which makes it possible
+to measure frame rates and latencies without physical hardware:
+
+    >>> from blinkstick import blinkstick, virtual
+    >>> virtual.enable([virtual.VirtualDevice(serial="BS000001-3.0", bcd_device=0x203, latency=0.001)])
+    >>> stick = blinkstick.find_first()
+    >>> stick.get_variant_string()
+    'BlinkStick Flex'
+"""
+
+import time
+import random
+import threading
+
+try:
+    from usb.core import USBError
+except ImportError:
+    class USBError(IOError):
+        pass
+
+
+VENDOR_ID = 0x20a0
+PRODUCT_ID = 0x41e5
+
+_devices = None
+
+
+class VirtualDevice(object):
+    """
+    VirtualDevice emulates a BlinkStick connected to the USB bus. It implements the
+    subset of the pyusb device interface used by L{blinkstick.BlinkStick}.
+    """
+
+    def __init__(self, serial="BS000001-3.0", manufacturer="Agile Innovative Ltd",
+                 description="BlinkStick", bcd_device=0x200, bus=1, address=1,
+                 latency=0.0, jitter=0.0, seed=None):
+        """
+        Initialize VirtualDevice class.
+
+        @type  serial: str
+        @param serial: serial number reported in string descriptor 3
+        @type  manufacturer: str
+        @param manufacturer: manufacturer reported in string descriptor 1
+        @type  description: str
+        @param description: description reported in string descriptor 2
+        @type  bcd_device: int
+        @param bcd_device: device release number used to determine the variant
+        @type  bus: int
+        @param bus: emulated USB bus number
+        @type  address: int
+        @param address: emulated USB device address
+        @type  latency: float
+        @param latency: time in seconds each transfer takes
+        @type  jitter: float
+        @param jitter: maximum random deviation in seconds added to the latency of each transfer
+        @type  seed: int
+        @param seed: seed for the jitter random number generator
+        """
+        self.idVendor = VENDOR_ID
+        self.idProduct = PRODUCT_ID
+        self.bcdDevice = bcd_device
+        self.bus = bus
+        self.address = address
+
+        self.strings = {1: manufacturer, 2: description, 3: serial}
+
+        self.latency = latency
+        self.jitter = jitter
+        self.connected = True
+
+        self.mode = 0
+        self.led_count = 0
+        self.info_blocks = {2: bytearray(32), 3: bytearray(32)}
+        self.led_data = [bytearray(64 * 3), bytearray(64 * 3), bytearray(64 * 3)]
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def __repr__(self):
+        return "VirtualDevice(serial={0!r}, bus={1}, address={2})".format(self.strings[3], self.bus, self.address)
+
+    def reset_stats(self):
+        """
+        Reset transfer counters.
+        """
+        self.transfer_count = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.busy_time = 0.0
+
+    def is_kernel_driver_active(self, interface):
+        return False
+
+    def detach_kernel_driver(self, interface):
+        pass
+
+    def get_string(self, index):
+        """
+        Read string descriptor.
+
+        @type  index: int
+        @param index: 1 - manufacturer, 2 - description, 3 - serial number
+        @rtype: str
+        @return: the value of the string descriptor
+        """
+        self._transfer_delay()
+        return self.strings.get(index)
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue, wIndex, data_or_wLength):
+        """
+        Emulate a control transfer with a HID feature report.
+        """
+        delay = self._transfer_delay()
+
+        with self._lock:
+            self.transfer_count += 1
+            self.busy_time += delay
+
+            if bmRequestType == 0x20:
+                data = bytearray(data_or_wLength)
+                self.bytes_written += len(data)
+                self._set_report(wValue, data)
+                return len(data)
+            else:
+                data = self._get_report(wValue)[:data_or_wLength]
+                self.bytes_read += len(data)
+                return data
+
+    def _transfer_delay(self):
+        if not self.connected:
+            raise USBError("Virtual device {0} is disconnected".format(self.strings[3]))
+
+        delay = self.latency
+        if self.jitter:
+            delay = max(0.0, delay + self._random.uniform(-self.jitter, self.jitter))
+
+        if delay:
+            time.sleep(delay)
+
+        return delay
+
+    def _set_report(self, report_id, data):
+        if report_id == 1:
+            # data[0] is the report id placeholder, followed by R, G and B
+            self.led_data[0][0:3] = bytearray([data[2], data[1], data[3]])
+        elif report_id in (2, 3):
+            block = data[1:33]
+            self.info_blocks[report_id] = block + bytearray(32 - len(block))
+        elif report_id == 4:
+            self.mode = data[1]
+        elif report_id == 5:
+            channel, index = data[1], data[2]
+            self.led_data[channel][index * 3:index * 3 + 3] = bytearray([data[4], data[3], data[5]])
+        elif 6 <= report_id <= 9:
+            channel = data[1]
+            frame = data[2:]
+            self.led_data[channel][0:len(frame)] = frame
+        elif report_id == 0x81:
+            self.led_count = data[1]
+        else:
+            raise USBError("Unsupported feature report {0}".format(report_id))
+
+    def _get_report(self, report_id):
+        if report_id == 1:
+            g, r, b = self.led_data[0][0:3]
+            return bytearray([1, r, g, b])
+        elif report_id in (2, 3):
+            return bytearray([report_id]) + self.info_blocks[report_id]
+        elif report_id == 4:
+            return bytearray([4, self.mode])
+        elif 6 <= report_id <= 9:
+            max_leds = {6: 8, 7: 16, 8: 32, 9: 64}[report_id]
+            return bytearray([report_id, 0]) + self.led_data[0][0:max_leds * 3]
+        elif report_id == 0x81:
+            return bytearray([0x81, self.led_count])
+        else:
+            raise USBError("Unsupported feature report {0}".format(report_id))
+
+
+def is_virtual(device):
+    """
+    Check whether device is a virtual device.
+
+    @rtype: bool
+    @return: True if device is an instance of L{VirtualDevice}
+    """
+    return isinstance(device, VirtualDevice)
+
+
+def enable(devices):
+    """
+    Replace USB enumeration with the supplied virtual devices.
+
+    @type  devices: VirtualDevice[]
+    @param devices: virtual devices to report as attached
+    """
+    global _devices
+    _devices = list(devices)
+
+
+def disable():
+    """
+    Restore USB enumeration of physical devices.
+    """
+    global _devices
+    _devices = None
+
+
+def is_enabled():
+    """
+    @rtype: bool
+    @return: True if virtual devices replace USB enumeration
+    """
+    return _devices is not None
+
+
+def find(find_all=True):
+    """
+    Find connected virtual devices.
+
+    @rtype: VirtualDevice[] or VirtualDevice
+    @return: a list of connected devices, or the first connected device or None if find_all is False
+    """
+    devices = [d for d in _devices or [] if d.connected]
+
+    if find_all:
+        return devices
+    elif devices:
+        return devices[0]
@@ -40,10 +40,14 @@ setup(
     author='Arvydas Juskevicius',
     author_email='arvydas@arvydas.co.uk',
     packages=find_packages(),
-    scripts=["bin/blinkstick"],
+    scripts=["bin/blinkstick", "bin/blinkstickd"],
     url='http://pypi.python.org/pypi/BlinkStick/',
     license='LICENSE.txt',
     description='Python package to control BlinkStick USB devices.',
     long_description=read('README.rst'),
     install_requires=os_requires,
+    extras_require={
+        "numpy": ["numpy"],
+        "images": ["Pillow"],
+    },
 )
@@ -0,0 +1,48 @@
+import unittest
+
+from blinkstick import daemon, virtual
+
+
+class RescanTest(unittest.TestCase):
+
+    def setUp(self):
+        self.devices = [virtual.VirtualDevice(serial="BS00000{0}-3.0".format(i), bcd_device=0x203, address=i + 1)
+                        for i in range(2)]
+        virtual.enable(self.devices)
+
+        # pyusb enumerates devices with a generator, which can only be iterated once
+        self._find = virtual.find
+        virtual.find = lambda find_all=True: iter(self._find(find_all=find_all))
+
+    def tearDown(self):
+        virtual.find = self._find
+        virtual.disable()
+
+    def test_rescan_opens_devices_from_generator(self):
+        d = daemon.BlinkStickDaemon(socket_path="/tmp/blinkstickd-test.sock")
+        d.rescan()
+
+        self.assertEqual(sorted(d.sticks), ["BS000000-3.0", "BS000001-3.0"])
+
+    def test_rescan_drops_removed_devices(self):
+        d = daemon.BlinkStickDaemon(socket_path="/tmp/blinkstickd-test.sock")
+        d.rescan()
+
+        virtual.enable(self.devices[:1])
+        d.rescan()
+
+        self.assertEqual(sorted(d.sticks), ["BS000000-3.0"])
+
+    def test_request_settings_are_restored(self):
+        d = daemon.BlinkStickDaemon(socket_path="/tmp/blinkstickd-test.sock")
+        response = d.handle({"command": "set_color", "serial": "BS000000-3.0", "args": {"red": 255},
+                             "inverse": True, "max_rgb_value": 128})
+
+        self.assertEqual(response["errors"], {})
+        stick = d.sticks["BS000000-3.0"]
+        self.assertFalse(stick.get_inverse())
+        self.assertEqual(stick.max_rgb_value, 255)
+
+
+if __name__ == "__main__":
+    unittest.main()